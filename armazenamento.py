@@ -0,0 +1,274 @@
+"""
+Armazenamento da cadeia de blocos.
+
+MemoryChainStore mantém tudo em listas (comportamento original, sem
+persistência). FileChainStore grava em um diretório:
+
+    blocks.dat  registros append-only: u32 tamanho, u32 crc32, bloco codificado
+                por codificacao.encode_block
+    blocks.idx  uma entrada de tamanho fixo por bloco (ENTRY), lida via mmap:
+                offset do registro, tamanho, hash do bloco e os totais
+                acumulados de transações, recompensas e trabalho (soma das
+                dificuldades) até ele
+
+Ao abrir, só o índice é mapeado; os blocos são lidos do disco sob demanda.
+Um registro ou entrada incompleta no final dos arquivos (queda no meio de
+uma gravação) é descartado, como se o append nunca tivesse acontecido.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+import codificacao
+
+_RECORD_HEADER = struct.Struct('<II')
+ENTRY = struct.Struct('<QI32sQdQ')
+
+
+class StoreError(Exception):
+    """ Arquivos da cadeia corrompidos """
+
+
+class MemoryChainStore:
+    """ Cadeia mantida apenas em memória """
+
+    def __init__(self):
+        self.blocks = []
+        self.hashes = []
+        self.totals_list = []
+        self.work_list = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def block(self, position):
+        return self.blocks[position]
+
+    def block_hash(self, position):
+        return self.hashes[position]
+
+    def position(self, block_hash):
+        return self.positions.get(block_hash)
+
+    def totals(self, position):
+        """ (transações, recompensas) acumuladas da gênese até o bloco em position """
+        return self.totals_list[position]
+
+    def work(self, position):
+        """ Trabalho acumulado da gênese até o bloco em position """
+        return self.work_list[position]
+
+    def append(self, block, block_hash, total_transactions, total_rewards, total_work):
+        self.positions[block_hash] = len(self.blocks)
+        self.blocks.append(block)
+        self.hashes.append(block_hash)
+        self.totals_list.append((total_transactions, total_rewards))
+        self.work_list.append(total_work)
+
+    def truncate(self, length):
+        for block_hash in self.hashes[length:]:
+            del self.positions[block_hash]
+        del self.blocks[length:]
+        del self.hashes[length:]
+        del self.totals_list[length:]
+        del self.work_list[length:]
+
+    def close(self):
+        pass
+
+
+class FileChainStore:
+    """ Cadeia persistida em arquivos append-only com índice mapeado em memória """
+
+    DATA_FILE = 'blocks.dat'
+    INDEX_FILE = 'blocks.idx'
+    CACHE_SIZE = 1024  # Blocos decodificados mantidos em memória
+
+    def __init__(self, directory, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.fsync = fsync
+        self.lock = threading.RLock()
+        self.data = open(os.path.join(directory, self.DATA_FILE), 'a+b')
+        self.index = open(os.path.join(directory, self.INDEX_FILE), 'a+b')
+        self.cache = OrderedDict()
+        self.positions = None  # Hash -> posição, montado na primeira consulta por hash
+        self.index_map = None
+        self.count = self._recover()
+        self._remap()
+        self.data_end = self._record_end(self.count - 1) if self.count else 0
+
+    def _recover(self):
+        """ Descarta entradas e registros incompletos no final dos arquivos """
+        index_size = os.fstat(self.index.fileno()).st_size
+        data_size = os.fstat(self.data.fileno()).st_size
+        count = index_size // ENTRY.size
+        while count > 0:
+            offset, size = self._read_entry_from_file(count - 1)[:2]
+            if offset + _RECORD_HEADER.size + size <= data_size and self._record_is_valid(offset, size):
+                break
+            count -= 1
+        self.index.truncate(count * ENTRY.size)
+        if count:
+            offset, size = self._read_entry_from_file(count - 1)[:2]
+            self.data.truncate(offset + _RECORD_HEADER.size + size)
+        else:
+            self.data.truncate(0)
+        return count
+
+    def _read_entry_from_file(self, position):
+        self.index.seek(position * ENTRY.size)
+        return ENTRY.unpack(self.index.read(ENTRY.size))
+
+    def _record_is_valid(self, offset, size):
+        self.data.seek(offset)
+        header = self.data.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            return False
+        record_size, crc = _RECORD_HEADER.unpack(header)
+        payload = self.data.read(size)
+        return record_size == size and len(payload) == size and zlib.crc32(payload) == crc
+
+    def _remap(self):
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        if self.count:
+            self.index_map = mmap.mmap(self.index.fileno(), self.count * ENTRY.size, access=mmap.ACCESS_READ)
+
+    def _entry(self, position):
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError('Bloco fora da cadeia: {}'.format(position))
+        if self.index_map is None or (position + 1) * ENTRY.size > len(self.index_map):
+            self._remap()
+        return ENTRY.unpack_from(self.index_map, position * ENTRY.size)
+
+    def _record_end(self, position):
+        offset, size = self._entry(position)[:2]
+        return offset + _RECORD_HEADER.size + size
+
+    def __len__(self):
+        return self.count
+
+    def block(self, position):
+        with self.lock:
+            if position < 0:
+                position += self.count
+            block = self.cache.get(position)
+            if block is not None:
+                self.cache.move_to_end(position)
+                return block
+            offset, size = self._entry(position)[:2]
+            self.data.seek(offset)
+            record = self.data.read(_RECORD_HEADER.size + size)
+            record_size, crc = _RECORD_HEADER.unpack_from(record)
+            payload = record[_RECORD_HEADER.size:]
+            if record_size != size or zlib.crc32(payload) != crc:
+                raise StoreError('Registro corrompido para o bloco na posição {}'.format(position))
+            block = codificacao.decode_block(payload)
+            self._cache(position, block)
+            return block
+
+    def _cache(self, position, block):
+        self.cache[position] = block
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def block_hash(self, position):
+        with self.lock:
+            return self._entry(position)[2].hex()
+
+    def position(self, block_hash):
+        with self.lock:
+            if self.positions is None:
+                self.positions = {self.block_hash(position): position for position in range(self.count)}
+            return self.positions.get(block_hash)
+
+    def totals(self, position):
+        with self.lock:
+            return self._entry(position)[3:5]
+
+    def work(self, position):
+        with self.lock:
+            return self._entry(position)[5]
+
+    def append(self, block, block_hash, total_transactions, total_rewards, total_work):
+        with self.lock:
+            payload = codificacao.encode_block(block)
+            offset = self.data_end
+            try:
+                # O registro vai para o disco antes da entrada do índice que aponta para ele
+                self.data.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+                self._flush(self.data)
+                self.index.write(ENTRY.pack(offset, len(payload), bytes.fromhex(block_hash),
+                                            total_transactions, total_rewards, total_work))
+                self._flush(self.index)
+            except Exception:
+                # Desfaz a gravação parcial: o próximo append continua de data_end e da entrada count
+                self.data.truncate(offset)
+                self.index.truncate(self.count * ENTRY.size)
+                raise
+            self.data_end = offset + _RECORD_HEADER.size + len(payload)
+            if self.positions is not None:
+                self.positions[block_hash] = self.count
+            self._cache(self.count, block)
+            self.count += 1
+
+    def truncate(self, length):
+        with self.lock:
+            if length >= self.count:
+                return
+            if self.positions is not None:
+                for position in range(length, self.count):
+                    del self.positions[self.block_hash(position)]
+            self.data_end = self._record_end(length - 1) if length else 0
+            self.count = length
+            # O mapa precisa ser fechado antes de encolher o arquivo mapeado
+            self._remap()
+            self.index.truncate(length * ENTRY.size)
+            self.data.truncate(self.data_end)
+            self._flush(self.index)
+            self._flush(self.data)
+            for position in [position for position in self.cache if position >= length]:
+                del self.cache[position]
+
+    def _flush(self, file):
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+
+    def close(self):
+        with self.lock:
+            if self.index_map is not None:
+                self.index_map.close()
+                self.index_map = None
+            self.data.close()
+            self.index.close()
+
+
+class ChainView:
+    """ Sequência somente leitura sobre os blocos de um store (len, índices, fatias e iteração) """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.store.block(position) for position in range(*key.indices(len(self.store)))]
+        if key < 0:
+            key += len(self.store)
+        if not 0 <= key < len(self.store):
+            raise IndexError('Bloco fora da cadeia: {}'.format(key))
+        return self.store.block(key)
+
+    def __iter__(self):
+        for position in range(len(self.store)):
+            yield self.store.block(position)
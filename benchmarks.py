@@ -0,0 +1,223 @@
+import json
+import random
+import socket
+import sys
+import threading
+import time
+
+import requests
+
+import codificacao
+from blocos import Block, Transaction
+from mineracao import search_range, valid_proof
+
+
+def benchmark_hashing(last_proof=100, total=300000):
+    """ Compara hashes por segundo entre valid_proof e o caminho rápido search_range """
+    start = time.perf_counter()
+    for proof in range(total):
+        valid_proof(last_proof, proof)
+    before = total / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _search_all(last_proof, total)
+    after = total / (time.perf_counter() - start)
+
+    print('valid_proof:  {:,.0f} hashes/s'.format(before))
+    print('search_range: {:,.0f} hashes/s'.format(after))
+    print('Ganho: {:.2f}x'.format(after / before))
+
+
+def _search_all(last_proof, total):
+    """ Executa search_range em janelas, sem parar na primeira prova encontrada """
+    start = 0
+    while start < total:
+        proof = search_range(last_proof, start, total)
+        start = total if proof is None else proof + 1
+
+
+def benchmark_load(modes=('simples', 'threads', 'asyncio'), clients=(1, 8, 64), requests_per_client=50):
+    """ Mede requisições/s e latência p99 de POST /transactions/new em cada modo de servidor """
+    import blockchain
+
+    class QuietHandler(blockchain.RequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    for mode in modes:
+        # Blockchain nova por modo: a mempool de um modo recusaria as transações repetidas do seguinte
+        blockchain.configure(QuietHandler)
+        port = _free_port()
+        server = blockchain.SERVER_CLASSES[mode](('127.0.0.1', port), QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://127.0.0.1:{}/transactions/new'.format(port)
+        _wait_for_server(url)
+        for concurrency in clients:
+            latencies, errors, elapsed = _run_clients(url, concurrency, requests_per_client)
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+            print('{:8} {:3} clientes: {:8.0f} req/s  p99 {:7.2f} ms  erros {}'.format(
+                mode, concurrency, len(latencies) / elapsed, p99 * 1000, errors))
+
+
+def benchmark_batch(batch_sizes=(1, 10, 100, 1000), total=5000):
+    """ Mede transações/s enviadas uma por requisição e em lotes de /transactions/batch """
+    import blockchain
+
+    class QuietHandler(blockchain.RequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    blockchain.configure(QuietHandler)
+    port = _free_port()
+    server = blockchain.ConcurrentHTTPServer(('127.0.0.1', port), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:{}'.format(port)
+    _wait_for_server(base + '/chain/tip')
+
+    session = requests.Session()
+    for batch_size in batch_sizes:
+        transactions = [{'sender': 'L{}'.format(batch_size), 'recipient': 'B', 'amount': number}
+                        for number in range(total)]
+        start = time.perf_counter()
+        accepted = 0
+        for first in range(0, total, batch_size):
+            if batch_size == 1:
+                response = session.post(base + '/transactions/new', json=transactions[first])
+                accepted += response.status_code == 201
+            else:
+                response = session.post(base + '/transactions/batch', json=transactions[first:first + batch_size])
+                accepted += response.json()['accepted']
+        elapsed = time.perf_counter() - start
+        print('lote {:5}: {:8.0f} transações/s  aceitas {}'.format(batch_size, total / elapsed, accepted))
+    server.shutdown()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(url, timeout=5):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _run_clients(url, concurrency, requests_per_client):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client(sender):
+        session = requests.Session()
+        own = []
+        failed = 0
+        for number in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                response = session.post(url, json={'sender': sender, 'recipient': 'B', 'amount': number})
+            except requests.RequestException:
+                failed += 1
+                continue
+            if response.status_code != 201:
+                failed += 1
+                continue
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+            errors.append(failed)
+
+    # Remetentes distintos: a mempool recusa transações repetidas
+    threads = [threading.Thread(target=client, args=('A{}-{}'.format(concurrency, number),))
+               for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+def benchmark_encoding(num_blocks=10000, max_transactions=20):
+    """ Compara tamanho e tempo de codificação/decodificação da cadeia em JSON e em binário """
+    chain = _synthetic_chain(num_blocks, max_transactions)
+
+    start = time.perf_counter()
+    json_data = json.dumps({'chain': [block.to_dict() for block in chain], 'length': len(chain)}).encode()
+    json_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    assert [Block.from_dict(block) for block in json.loads(json_data)['chain']] == chain
+    json_decode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    binary_data = codificacao.encode_chain(chain)
+    binary_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    assert codificacao.decode_chain(binary_data) == chain
+    binary_decode = time.perf_counter() - start
+
+    print('{} blocos'.format(num_blocks))
+    print('JSON:    {:10,} bytes  codificação {:6.3f}s  decodificação {:6.3f}s'.format(
+        len(json_data), json_encode, json_decode))
+    print('Binário: {:10,} bytes  codificação {:6.3f}s  decodificação {:6.3f}s'.format(
+        len(binary_data), binary_encode, binary_decode))
+
+
+def _synthetic_chain(num_blocks, max_transactions):
+    """ Cadeia com transações aleatórias no mesmo formato que o nó produz """
+    rng = random.Random(42)
+    chain = []
+    for index in range(1, num_blocks + 1):
+        chain.append(Block(
+            index=index,
+            timestamp=1700000000.0 + index * 30.5,
+            transactions=[
+                Transaction('S{:07d}'.format(rng.randrange(10 ** 7)),
+                            'R{:07d}'.format(rng.randrange(10 ** 7)),
+                            rng.randint(1, 100))
+                for _ in range(rng.randint(0, max_transactions))
+            ],
+            proof=rng.randrange(10 ** 6),
+            previous_hash='{:064x}'.format(rng.getrandbits(256)),
+        ))
+    return chain
+
+
+def benchmark_memory(num_transactions=1000000):
+    """ Memória (tracemalloc) de 1M transações como dicts e como objetos Transaction """
+    import tracemalloc
+
+    for label, factory in (
+        ('dict', lambda number: {'sender': 'S{}'.format(number % 1000), 'recipient': 'R', 'amount': number}),
+        ('Transaction', lambda number: Transaction('S{}'.format(number % 1000), 'R', number)),
+    ):
+        tracemalloc.start()
+        transactions = [factory(number) for number in range(num_transactions)]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del transactions
+        print('{:12} {:8.1f} MiB  ({:.0f} bytes/transação)'.format(
+            label, current / 2 ** 20, current / num_transactions))
+
+
+BENCHMARKS = {
+    'hashing': benchmark_hashing,
+    'carga': benchmark_load,
+    'lote': benchmark_batch,
+    'codificacao': benchmark_encoding,
+    'memoria': benchmark_memory,
+}
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print('== {} =='.format(name))
+        BENCHMARKS[name]()
@@ -4,13 +4,28 @@ import hashlib
 from time import time
 import requests
 import pymysql
-import os
+
+from ingestao import ConnectionPool, IngestionFull, MetricsIngestor, insert_statement
+from registro import AppendLogWriter
+
+METRICS_COLUMNS = ('miner_address', 'miner_name', 'blocks_mined', 'errors_count', 'total_hashes', 'hash_rate',
+                   'total_mining_time', 'retransmission_time', 'reward', 'success_rate', 'cpu_usage',
+                   'cpu_frequency_ghz', 'repeat_transaction_miner', 'uptime')
+
+
+def connect_mysql():
+    return pymysql.connect(
+        host='localhost',
+        user='root',
+        password='',
+        database='validado'
+    )
 
 class Blockchain:
     # Variável de classe
     rec = 0
     ret=0
-    def __init__(self):
+    def __init__(self, connect=connect_mysql, paramstyle=pymysql.paramstyle, pool_size=2):
         self.chain = []
         self.current_transactions = []
         self.rewards_file = 'miner_rewards.txt'
@@ -19,14 +34,11 @@ class Blockchain:
         self.initialize_rewards_file()
         self.initialize_metrics_file()
         self.new_block(previous_hash='1', proof=100)  # Cria o bloco gênesis
-        self.db_connection = pymysql.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='validado'
-        )
-        self.db_cursor = self.db_connection.cursor()
+        # As métricas dos mineradores são gravadas em lotes, fora das requisições
+        self.db_pool = ConnectionPool(connect, pool_size)
         self.create_metrics_table()
+        self.metrics_ingestor = MetricsIngestor(self.db_pool, insert_statement('miner_metrics', METRICS_COLUMNS,
+                                                                               paramstyle))
         self.start_time = time()  # Define o tempo de início
         
     def create_metrics_table(self):
@@ -51,27 +63,33 @@ class Blockchain:
             uptime FLOAT NOT NULL
         )
         """
+        # Conexão própria, fechada em seguida: as do pool são abertas na thread que grava as métricas
         try:
-            self.db_cursor.execute(create_table_query)
-            self.db_connection.commit()
-        except pymysql.MySQLError as e:
+            connection = self.db_pool.connect()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(create_table_query)
+                cursor.close()
+                connection.commit()
+            finally:
+                connection.close()
+        except Exception as e:
             print('Erro ao criar tabela de métricas: {}'.format(e))
 
     def record_miner_metrics(self, miner_address, miner_name, blocks_mined, errors_count, total_hashes, hash_rate, total_mining_time, retransmission_time, reward=None, success_rate=None,cpu_usage=None, cpu_frequency_ghz=None, repeat_transaction_miner=None, uptime=None):
-        """ Registra as métricas do minerador no banco de dados """
+        """
+        Enfileira as métricas do minerador para gravação em lote no banco de
+        dados. Retorna False se não há recompensa a registrar; levanta
+        IngestionFull se a fila de ingestão estiver cheia.
+        """
         reward = Blockchain.rec  # Usa a variável de classe rec se reward não for fornecido
-        if reward > 0:            
-            insert_query = """
-            INSERT INTO miner_metrics (miner_address, miner_name, blocks_mined, errors_count, total_hashes, hash_rate, total_mining_time, retransmission_time, reward,success_rate,cpu_usage, cpu_frequency_ghz, repeat_transaction_miner, uptime)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            try:
-                self.db_cursor.execute(insert_query, (miner_address, miner_name, blocks_mined, errors_count, total_hashes, hash_rate, total_mining_time, retransmission_time, reward, success_rate, cpu_usage, cpu_frequency_ghz, repeat_transaction_miner, uptime))
-                self.db_connection.commit()
-            except Exception as e:
-                print('Erro ao registrar métricas no banco de dados: {}'.format(e))
+        if reward <= 0:
+            return False
+        self.metrics_ingestor.submit((miner_address, miner_name, blocks_mined, errors_count, total_hashes, hash_rate,
+                                      total_mining_time, retransmission_time, reward, success_rate, cpu_usage,
+                                      cpu_frequency_ghz, repeat_transaction_miner, uptime))
+        return True
 
-        
     def new_block(self, proof, previous_hash=None, miner_address=None):
         block = {
             'index': len(self.chain) + 1,
@@ -163,15 +181,12 @@ class Blockchain:
         return False
 
     def initialize_rewards_file(self):
-        """ Cria o arquivo de recompensas se não existir """
-        if not os.path.isfile(self.rewards_file):
-            with open(self.rewards_file, mode='w') as file:
-                file.write('Miner Address, Amount\n')
+        """ Abre o registro de recompensas, criando o arquivo com o cabeçalho se não existir """
+        self.rewards_log = AppendLogWriter(self.rewards_file, ('Miner Address', 'Amount'), separator=': ')
 
     def record_reward(self, miner_address, amount):
-        """ Registra a recompensa no arquivo TXT """
-        with open(self.rewards_file, mode='a') as file:
-            file.write('{}: {}\n'.format(miner_address, amount))
+        """ Registra a recompensa (gravada em segundo plano pelo rewards_log) """
+        self.rewards_log.write((miner_address, amount))
 
     def calculate_reward(self, num_transactions):
         """ Calcula a recompensa com base no número de transações no bloco """
@@ -186,13 +201,13 @@ class Blockchain:
             return 0.2
 
     def initialize_metrics_file(self):
-        """ Cria o arquivo de métricas se não existir e escreve o cabeçalho """
-        if not os.path.isfile(self.metrics_file):
-            with open(self.metrics_file, mode='w') as file:
-                file.write('Comprimento da Cadeia, Tempo de Geração de Blocos, Número de Transações por Bloco, Taxa de Transações Confirmadas, Recompensas Acumuladas\n')
+        """ Abre o registro de métricas, criando o arquivo com o cabeçalho se não existir """
+        self.metrics_log = AppendLogWriter(self.metrics_file, (
+            'Comprimento da Cadeia', 'Tempo de Geração de Blocos', 'Número de Transações por Bloco',
+            'Taxa de Transações Confirmadas', 'Recompensas Acumuladas'))
 
     def save_metrics(self):
-        """ Salva as métricas da blockchain em um arquivo TXT """
+        """ Registra as métricas da blockchain (gravadas em segundo plano pelo metrics_log) """
         # Calcular as métricas
         current_time = time()
         block_times = [block['timestamp'] for block in self.chain]
@@ -215,20 +230,22 @@ class Blockchain:
             total_rewards  # Total de recompensas acumuladas
         )
 
-        # Adicionar métricas ao arquivo
-        with open(self.metrics_file, mode='a') as file:
-            file.write(', '.join(map(str, metrics)) + '\n')
+        self.metrics_log.write(metrics)
     def close(self):
-       self.db_cursor.close()
-       self.db_connection.close()  
+       self.metrics_ingestor.close()  # Grava o que ainda estiver na fila antes de fechar as conexões
+       self.db_pool.close()
+       self.rewards_log.close()
+       self.metrics_log.close()
 
 class RequestHandler(BaseHTTPRequestHandler):
     blockchain = Blockchain()
     port = 8000  # Porta do servidor, pode ser ajustada conforme necessário
 
-    def _send_response(self, response, status_code=200):
+    def _send_response(self, response, status_code=200, headers=()):
         self.send_response(status_code)
         self.send_header('Content-type', 'application/json')
+        for name, value in headers:
+            self.send_header(name, value)
         self.end_headers()
         self.wfile.write(json.dumps(response).encode())
 
@@ -296,25 +313,30 @@ class RequestHandler(BaseHTTPRequestHandler):
             if not all(k in metrics for k in required):
                 self.send_error(400, 'Faltam parâmetros')
                 return
-            self.blockchain.record_miner_metrics(
-                metrics['miner_address'],
-                metrics['miner_name'],
-                metrics['blocks_mined'],
-                metrics['errors_count'],
-                metrics['total_hashes'],
-                metrics['hash_rate'],
-                metrics['total_mining_time'],                                
-                metrics['retransmission_time'],
-                metrics['reward'],
-                metrics['success_rate'],
-                metrics['cpu_usage'],  # uso da CPU
-                metrics['cpu_frequency_ghz'],  # Frequência da CPU
-                metrics['repeat_transaction_miner'],# repetições na transmissão de mineração
-                metrics['uptime']
-            )
-            if (Blockchain.rec>0):
-                response = {'message': 'Métricas do minerador salvas com sucesso'}
-                self._send_response(response, 201)
+            try:
+                queued = self.blockchain.record_miner_metrics(
+                    metrics['miner_address'],
+                    metrics['miner_name'],
+                    metrics['blocks_mined'],
+                    metrics['errors_count'],
+                    metrics['total_hashes'],
+                    metrics['hash_rate'],
+                    metrics['total_mining_time'],                                
+                    metrics['retransmission_time'],
+                    metrics['reward'],
+                    metrics['success_rate'],
+                    metrics['cpu_usage'],  # uso da CPU
+                    metrics['cpu_frequency_ghz'],  # Frequência da CPU
+                    metrics['repeat_transaction_miner'],# repetições na transmissão de mineração
+                    metrics['uptime']
+                )
+            except IngestionFull as e:
+                self._send_response({'message': str(e)}, 503, [('Retry-After', '5')])
+                return
+            if queued:
+                # A gravação acontece em segundo plano, no próximo lote
+                response = {'message': 'Métricas do minerador recebidas'}
+                self._send_response(response, 202)
             else:
                 response = {'message': 'Off'}
                 self._send_response(response, 200)
@@ -369,7 +391,10 @@ def run(server_class=HTTPServer, handler_class=RequestHandler, port=8000):
     server_address = ('', port)
     httpd = server_class(server_address, handler_class)
     print('Iniciando o servidor na porta {}...'.format(port))
-    httpd.serve_forever()
+    try:
+        httpd.serve_forever()
+    finally:
+        handler_class.blockchain.close()
 
 if __name__ == "__main__":
     run(port=RequestHandler.port)
@@ -1,85 +1,488 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlparse, parse_qs, unquote
+import argparse
+import asyncio
 import json
-import hashlib
+import queue
+import threading
+import uuid
 from time import time
-import requests
-import os
+import codificacao
+from armazenamento import ChainView, FileChainStore, MemoryChainStore
+from blocos import Block, Transaction
+from enderecos import AddressIndex
+from mempool import Mempool, MempoolFull
+from merkle import merkle_proof
+from mineracao import DEFAULT_DIFFICULTY, MAX_PROOF, DifficultyRetarget, ParallelProofOfWork, valid_proof
+from pares import Gossip, PeerClient, PeerTable
+from registro import FORMATS, FSYNC_POLICIES, AppendLogWriter
+from validacao import ParallelChainValidator
+
+class ChainMetrics:
+    """ Agregados da cadeia usados em save_metrics, atualizados em O(1) a cada bloco """
+
+    def __init__(self, calculate_reward):
+        self.calculate_reward = calculate_reward
+        self.reset()
+
+    def reset(self):
+        self.length = 0
+        self.total_transactions = 0
+        self.total_rewards = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def restore(self, store, length):
+        """ Posiciona os agregados no bloco length - 1 a partir dos totais acumulados do store """
+        self.reset()
+        if length:
+            self.length = length
+            self.total_transactions, self.total_rewards = store.totals(length - 1)
+            self.first_timestamp = store.block(0).timestamp
+            self.last_timestamp = store.block(length - 1).timestamp
+
+    def totals_after(self, block):
+        """ (transações, recompensas) acumuladas incluindo block, sem alterar os agregados """
+        num_transactions = len(block.transactions)
+        return self.total_transactions + num_transactions, self.total_rewards + self.calculate_reward(num_transactions)
+
+    def add_block(self, block):
+        if self.first_timestamp is None:
+            self.first_timestamp = block.timestamp
+        self.last_timestamp = block.timestamp
+        self.length += 1
+        self.total_transactions, self.total_rewards = self.totals_after(block)
+
+    @property
+    def block_generation_time(self):
+        return (self.last_timestamp - self.first_timestamp) / (self.length - 1) if self.length > 1 else 0
+
+    @property
+    def avg_transactions_per_block(self):
+        return self.total_transactions / self.length if self.length else 0
+
+class StaleWork(Exception):
+    """ Prova enviada por um minerador sobre um topo que não é mais o da cadeia """
+
+
+class ChainChanged(Exception):
+    """ A cadeia trocou de bifurcação durante a leitura de um intervalo de blocos """
+
 
 class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.current_transactions = []
+    REWARD_COLUMNS = ('Miner Address', 'Amount')
+    METRICS_COLUMNS = ('Comprimento da Cadeia', 'Tempo de Geração de Blocos', 'Número de Transações por Bloco',
+                       'Taxa de Transações Confirmadas', 'Recompensas Acumuladas')
+
+    def __init__(self, pow_engine=None, store=None, validator=None, mempool=None, retarget=None, log_options=None):
+        self.store = store if store is not None else MemoryChainStore()  # Blocos, seus hashes e totais acumulados
+        self.chain = ChainView(self.store)
+        self.mempool = mempool if mempool is not None else Mempool()  # Transações pendentes
+        self.addresses = AddressIndex()  # Montado sob demanda para cadeias carregadas do disco
         self.rewards_file = 'miner_rewards.txt'
         self.metrics_file = 'metrics.txt'
+        self.log_options = log_options or {}  # Repassadas aos AppendLogWriter (formato, fsync, intervalo)
         self.start_time = time()
+        self.pow_engine = pow_engine or ParallelProofOfWork()  # Motor de prova de trabalho (um processo por núcleo)
+        self.validator = validator or ParallelChainValidator()  # Valida cadeias recebidas em lotes paralelos
+        self.retarget = retarget or DifficultyRetarget()  # Regra de ajuste da dificuldade (igual em todos os nós)
+        self.lock = threading.RLock()  # Protege chain e mempool entre as threads do servidor
+        self.metrics = ChainMetrics(self.calculate_reward)
+        self.listeners = []  # Chamados com (tipo, hash) a cada bloco ou transação nova, ex.: Gossip.announce
         self.initialize_rewards_file()
         self.initialize_metrics_file()
-        self.new_block(previous_hash='1', proof=100)  # Cria o bloco gênesis
+        if len(self.store):
+            self.metrics.restore(self.store, len(self.store))  # Cadeia carregada do disco
+        else:
+            self.new_block(previous_hash='1', proof=100)  # Cria o bloco gênesis
 
     def new_block(self, proof, previous_hash=None, miner_address=None):
-        block = {
-            'index': len(self.chain) + 1,
-            'timestamp': time(),
-            'transactions': self.current_transactions,
-            'proof': proof,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]),
-        }
-        self.current_transactions = []
-        self.chain.append(block)
-        if block['index'] > 1 and miner_address:
-            reward = self.calculate_reward(len(block['transactions']))
+        with self.lock:
+            return self._new_block(proof, previous_hash, miner_address)
+
+    def _new_block(self, proof, previous_hash, miner_address):
+        block = Block.build(
+            index=len(self.chain) + 1,
+            timestamp=max(time(), self.last_block.timestamp) if len(self.chain) else time(),  # Nunca para trás
+            transactions=self.mempool.take(),  # As mais prioritárias, até mempool.max_per_block
+            proof=proof,
+            previous_hash=previous_hash or self.last_hash,
+            difficulty=self.next_difficulty(),
+        )
+        block_hash = self._append_block(block)
+        if block.index > 1 and miner_address:
+            reward = self.calculate_reward(len(block.transactions))
             self.record_reward(miner_address, reward)
         self.save_metrics()
+        self._notify('block', block_hash)
         return block
 
-    def new_transaction(self, sender, recipient, amount):
-        self.current_transactions.append({
-            'sender': sender,
-            'recipient': recipient,
-            'amount': amount,
-        })
-        return self.last_block['index'] + 1
+    def submit_proof(self, proof, previous_hash, miner_address=None):
+        """
+        Anexa um bloco com a prova encontrada por um minerador externo sobre
+        o bloco previous_hash. A prova é conferida com uma única chamada a
+        valid_proof. Levanta StaleWork se previous_hash não for mais o topo
+        (inclusive quando a mesma prova já foi aceita) e ValueError se a
+        prova for inválida ou não houver transações.
+        """
+        with self.lock:
+            if previous_hash != self.last_hash:
+                position = self.store.position(previous_hash)
+                if position is not None and position + 1 < len(self.chain) and \
+                        self.chain[position + 1].proof == proof:
+                    raise StaleWork('Prova já aceita no bloco {}'.format(position + 2))
+                raise StaleWork('O bloco {} não é mais o topo da cadeia'.format(previous_hash))
+            if not 0 <= proof < MAX_PROOF:
+                raise ValueError('Prova fora do intervalo [0, 2 ** 63)')
+            if not self.valid_proof(self.last_block.proof, proof, self.next_difficulty()):
+                raise ValueError('Prova inválida')
+            if not len(self.mempool):
+                raise ValueError('Nenhuma transação para minerar')
+            return self._new_block(proof, previous_hash, miner_address)
+
+    def new_transaction(self, sender, recipient, amount, fee=0):
+        """
+        Adiciona a transação à mempool e retorna o index do próximo bloco, ou
+        None se ela já estiver pendente. Levanta MempoolFull ou ValueError
+        (taxa inválida) se for recusada.
+        """
+        with self.lock:
+            if not self.add_transaction(Transaction(sender, recipient, amount, fee)):
+                return None
+            return self.last_block.index + 1
+
+    def add_transaction(self, transaction):
+        """ Adiciona uma transação pendente (local ou recebida de um vizinho) e a anuncia se for nova """
+        transaction_hash = transaction.hash()
+        with self.lock:
+            if not self.mempool.add(transaction, transaction_hash):
+                return False
+            self._notify('tx', transaction_hash)
+            return True
+
+    def pending_transaction(self, transaction_hash):
+        """ Transação pendente com o hash informado, ou None """
+        with self.lock:
+            return self.mempool.get(transaction_hash)
+
+    def add_block(self, block):
+        """
+        Anexa um bloco recebido de um vizinho se ele continuar o topo local
+        com prova válida. Retorna False se não continuar (bloco antigo, de
+        outra bifurcação ou à frente do topo) ou se for inválido.
+        """
+        with self.lock:
+            if block.index != len(self.chain) + 1 or block.previous_hash != self.last_hash:
+                return False
+            if not self._valid_timestamp(block, self._block_at, time()) or \
+                    not self._valid_difficulty(block, self._block_at):
+                return False
+            if not self.valid_proof(self.last_block.proof, block.proof, block.effective_difficulty) or \
+                    not block.valid_merkle_root():
+                return False
+            block_hash = self._append_block(block)
+            self._drop_confirmed([block])
+            self.save_metrics()
+            self._notify('block', block_hash)
+            return True
+
+    def _append_block(self, block, block_hash=None):
+        """
+        Anexa o bloco ao store com seu hash (calculado uma única vez) e os
+        totais acumulados (transações, recompensas e trabalho). O store vem
+        primeiro: se a gravação falhar, os índices em memória continuam de
+        acordo com ele.
+        """
+        block_hash = block_hash or self.hash(block)
+        total_work = self._work_at(len(self.store)) + block.effective_difficulty
+        self.store.append(block, block_hash, *self.metrics.totals_after(block), total_work)
+        if self.addresses.length == len(self.store) - 1:  # Índice em dia: atualiza já (senão, na próxima consulta)
+            self.addresses.add_block(block)
+        self.metrics.add_block(block)
+        return block_hash
+
+    def _drop_confirmed(self, blocks):
+        """ Remove da mempool as transações que já entraram em blocks """
+        if len(self.mempool):
+            self.mempool.remove(transaction.hash() for block in blocks for transaction in block.transactions)
+
+    def _notify(self, kind, item_hash):
+        for listener in self.listeners:
+            listener(kind, item_hash)
 
     @staticmethod
     def hash(block):
-        block_string = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        return block.hash()
 
-    def proof_of_work(self, last_proof):
-        proof = 0
-        while not self.valid_proof(last_proof, proof):
-            proof += 1
-        return proof
+    def proof_of_work(self, last_proof, difficulty=DEFAULT_DIFFICULTY):
+        return self.pow_engine.search(last_proof, difficulty)
 
     @staticmethod
-    def valid_proof(last_proof, proof):
-        guess = '{}{}'.format(last_proof, proof).encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:4] == "0000"
+    def valid_proof(last_proof, proof, difficulty=DEFAULT_DIFFICULTY):
+        return valid_proof(last_proof, proof, difficulty)
+
+    def _block_at(self, index):
+        return self.chain[index - 1]
+
+    def next_difficulty(self):
+        """ Dificuldade exigida do próximo bloco da cadeia local """
+        with self.lock:
+            return self.retarget.expected(len(self.chain) + 1, self._block_at)
+
+    def _valid_timestamp(self, block, block_at, now):
+        """ Timestamp do bloco não anterior ao do bloco anterior nem muito à frente de now """
+        parent = block_at(block.index - 1) if block.index > 1 else None
+        return self.retarget.valid_timestamp(block.timestamp, parent.timestamp if parent is not None else None, now)
+
+    def _valid_difficulty(self, block, block_at):
+        """
+        Confere a dificuldade declarada no bloco contra o ajuste. Um bloco
+        sem dificuldade registrada só é aceito como gênese ou depois de outro
+        bloco antigo, para que não se possa voltar à dificuldade inicial.
+        """
+        if block.difficulty is None:
+            return block.index == 1 or block_at(block.index - 1).difficulty is None
+        return block.difficulty == self.retarget.expected(block.index, block_at)
+
+    def _valid_difficulties(self, chain):
+        """
+        Timestamps e dificuldades de chain (blocos consecutivos), olhando a
+        cadeia local antes do primeiro. Os timestamps de cada bloco são
+        conferidos antes de servirem de base para o ajuste dos seguintes.
+        """
+        first = chain[0].index
+        now = time()
+
+        def block_at(index):
+            return chain[index - first] if index >= first else self._block_at(index)
+
+        return all(self._valid_timestamp(block, block_at, now) and self._valid_difficulty(block, block_at)
+                   for block in chain)
+
+    def _work_at(self, length):
+        """ Trabalho acumulado dos primeiros length blocos, lido do store em O(1) """
+        return self.store.work(length - 1) if length else 0
+
+    def total_work(self):
+        """ Soma das dificuldades de todos os blocos da cadeia local """
+        with self.lock:
+            return self._work_at(len(self.store))
+
+    def work_gain(self, fork, blocks):
+        """
+        Quanto trabalho a cadeia ganharia trocando os blocos a partir da
+        posição fork por blocks (negativo ou zero se não compensar). É o
+        critério de escolha entre cadeias: a de mais trabalho, não a de mais
+        blocos, já que a dificuldade varia de bloco para bloco.
+        """
+        with self.lock:
+            local = self._work_at(len(self.store)) - self._work_at(fork)
+            return sum(block.effective_difficulty for block in blocks) - local
 
     @property
     def last_block(self):
         return self.chain[-1]
 
+    @property
+    def last_hash(self):
+        return self.store.block_hash(-1)
+
+    def block_position(self, block_hash):
+        """ Posição do bloco com o hash informado na cadeia local, ou None """
+        return self.store.position(block_hash)
+
+    def validate_chain(self, chain, previous=None, previous_hash=None):
+        """
+        Valida os elos de hash e as provas de uma cadeia recebida.
+
+        Se previous (com seu hash previous_hash) for informado, chain é um
+        sufixo que continua a partir desse bloco; caso contrário o primeiro
+        bloco de chain é aceito como está, como antes.
+
+        Retorna a lista com o hash de cada bloco (cada um calculado uma única
+        vez) para ser reaproveitada em replace_chain, ou None se for inválida.
+        """
+        if chain and not self._valid_difficulties(chain):
+            return None
+        head = []
+        if previous is None:
+            if not chain[0].valid_merkle_root():
+                return None
+            previous, previous_hash, chain = chain[0], self.hash(chain[0]), chain[1:]
+            head = [previous_hash]
+        hashes = self.validator.validate(chain, previous, previous_hash)
+        return None if hashes is None else head + hashes
+
+    def locator(self):
+        """
+        Hashes da cadeia local do topo para a gênese: os 10 últimos blocos e
+        depois saltos que dobram de tamanho, sempre terminando na gênese. Um
+        vizinho encontra o ancestral comum com uma única consulta.
+        """
+        with self.lock:
+            position = len(self.store) - 1
+            hashes = []
+            step = 1
+            while position > 0:
+                hashes.append(self.store.block_hash(position))
+                if len(hashes) >= 10:
+                    step *= 2
+                position -= step
+            hashes.append(self.store.block_hash(0))
+            return hashes
+
+    def find_ancestor(self, locator):
+        """ index do primeiro bloco do locator presente na cadeia local, ou 0 se nenhum for """
+        with self.lock:
+            for block_hash in locator:
+                position = self.store.position(block_hash)
+                if position is not None:
+                    return position + 1
+            return 0
+
     def get_chain(self):
-        return self.chain
+        with self.lock:
+            return list(self.chain)
+
+    def block_headers(self, first, last):
+        """ Cabeçalhos dos blocos nas posições [first, last), com a quantidade de transações e o hash """
+        with self.lock:
+            headers = []
+            for position in range(first, min(last, len(self.chain))):
+                block = self.chain[position]
+                header = block.header()
+                header['tx_count'] = len(block.transactions)
+                header['hash'] = self.store.block_hash(position)
+                headers.append(header)
+            return headers
+
+    def block_range(self, start=1, end=None, limit=None):
+        """
+        Intervalo de posições [first, last) dos blocos com index entre start e
+        end (inclusive), limitado a limit blocos. Os blocos são lidos depois,
+        um a um, com iter_blocks.
+        """
+        with self.lock:
+            length = len(self.chain)
+        first = max(start, 1) - 1
+        last = length if end is None else min(end, length)
+        if limit is not None:
+            last = min(last, first + max(limit, 0))
+        return first, max(first, last), length
 
-    def replace_chain(self, new_chain):
-        if len(new_chain) > len(self.chain):
-            self.chain = new_chain
+    def iter_blocks(self, first, last):
+        """
+        Blocos das posições [first, last), lidos um a um sem segurar o lock
+        entre eles. O hash do último bloco é guardado no início; como cada
+        bloco se liga ao anterior, se ele continuar na posição last - 1
+        nenhum bloco do intervalo mudou. Se mudou (troca de cadeia no meio da
+        leitura), levanta ChainChanged em vez de misturar duas bifurcações.
+        """
+        if first >= last:
+            return
+        with self.lock:
+            if len(self.store) < last:
+                raise ChainChanged('A cadeia encolheu antes da leitura')
+            end_hash = self.store.block_hash(last - 1)
+        for position in range(first, last):
+            with self.lock:
+                if len(self.store) < last or self.store.block_hash(last - 1) != end_hash:
+                    raise ChainChanged('A cadeia mudou durante a leitura do bloco {}'.format(position + 1))
+                block = self.chain[position]
+            yield block
+
+    def replace_chain(self, new_chain, hashes=None):
+        with self.lock:
+            hashes = hashes or [self.hash(block) for block in new_chain]
+            # Mantém o prefixo comum e regrava apenas os blocos a partir da bifurcação
+            fork = 0
+            while fork < min(len(self.store), len(hashes)) and self.store.block_hash(fork) == hashes[fork]:
+                fork += 1
+            return self.replace_suffix(fork, new_chain[fork:], hashes[fork:])
+
+    def replace_suffix(self, fork, blocks, hashes):
+        """
+        Substitui os blocos a partir da posição fork por blocks (já validados,
+        com seus hashes). Só aplica se o resultado tiver mais trabalho
+        acumulado que a cadeia atual e se blocks ainda continuar o bloco
+        local em fork - 1.
+        """
+        with self.lock:
+            if fork > len(self.store) or self.work_gain(fork, blocks) <= 0:
+                return False
+            if fork > 0 and blocks and blocks[0].previous_hash != self.store.block_hash(fork - 1):
+                return False
+            if self.addresses.length > fork:
+                self.addresses.remove_blocks(self.chain[fork:self.addresses.length])
+            self.store.truncate(fork)
+            self.metrics.restore(self.store, fork)
+            for block, block_hash in zip(blocks, hashes):
+                self._append_block(block, block_hash)
+            self._drop_confirmed(blocks)
+            self._notify('block', self.last_hash)
             return True
-        return False
+
+    def transaction_proof(self, index, transaction_hash):
+        """
+        Prova de inclusão da transação no bloco index: o cabeçalho do bloco
+        (cujo hash cobre a raiz), a posição da transação e os irmãos do
+        caminho até a raiz. None se o bloco não existir, não tiver raiz de
+        Merkle ou não contiver a transação.
+        """
+        with self.lock:
+            if not 1 <= index <= len(self.chain):
+                return None
+            block = self.chain[index - 1]
+            block_hash = self.store.block_hash(index - 1)
+        if block.merkle_root is None:
+            return None
+        hashes = [transaction.hash() for transaction in block.transactions]
+        if transaction_hash not in hashes:
+            return None
+        position = hashes.index(transaction_hash)
+        return {
+            'hash': block_hash,
+            'header': block.header(),
+            'transaction': transaction_hash,
+            'position': position,
+            'proof': merkle_proof(hashes, position),
+        }
+
+    def _address_index(self):
+        """ O índice de endereços, completando os blocos que ainda não foram indexados """
+        for position in range(self.addresses.length, len(self.store)):
+            self.addresses.add_block(self.store.block(position))
+        return self.addresses
+
+    def address_balance(self, address):
+        with self.lock:
+            return self._address_index().balance(address)
+
+    def address_transactions(self, address, limit=None):
+        """ Transações confirmadas do endereço, da mais recente para a mais antiga, com o bloco de cada uma """
+        with self.lock:
+            transactions = []
+            for index, position in self._address_index().recent(address, limit):
+                data = self.chain[index - 1].transactions[position].to_dict()
+                data['block'] = index
+                transactions.append(data)
+            return transactions
+
+    def close(self):
+        self.rewards_log.close()
+        self.metrics_log.close()
+        self.store.close()
 
     def initialize_rewards_file(self):
-        """ Cria o arquivo de recompensas se não existir """
-        if not os.path.isfile(self.rewards_file):
-            with open(self.rewards_file, mode='w') as file:
-                file.write('Miner Address, Amount\n')
+        """ Abre o registro de recompensas, criando o arquivo com o cabeçalho se não existir """
+        self.rewards_log = AppendLogWriter(self.rewards_file, self.REWARD_COLUMNS, separator=': ', **self.log_options)
 
     def record_reward(self, miner_address, amount):
-        """ Registra a recompensa no arquivo TXT """
-        with open(self.rewards_file, mode='a') as file:
-            file.write('{}: {}\n'.format(miner_address, amount))
+        """ Registra a recompensa (gravada em segundo plano pelo rewards_log) """
+        self.rewards_log.write((miner_address, amount))
 
     def calculate_reward(self, num_transactions):
         """ Calcula a recompensa com base no número de transações no bloco """
@@ -91,147 +494,738 @@ class Blockchain:
             return 0.2
 
     def initialize_metrics_file(self):
-        """ Cria o arquivo de métricas se não existir e escreve o cabeçalho """
-        if not os.path.isfile(self.metrics_file):
-            with open(self.metrics_file, mode='w') as file:
-                file.write('Comprimento da Cadeia, Tempo de Geração de Blocos, Número de Transações por Bloco, Taxa de Transações Confirmadas, Recompensas Acumuladas\n')
+        """ Abre o registro de métricas, criando o arquivo com o cabeçalho se não existir """
+        self.metrics_log = AppendLogWriter(self.metrics_file, self.METRICS_COLUMNS, **self.log_options)
 
     def save_metrics(self):
-        """ Salva as métricas da blockchain em um arquivo TXT """
-        # Calcular as métricas
-        current_time = time()
-        block_times = [block['timestamp'] for block in self.chain]
-        block_generation_time = (block_times[-1] - block_times[0]) / (len(self.chain) - 1) if len(self.chain) > 1 else 0
-        num_transactions_per_block = [len(block['transactions']) for block in self.chain]
-        avg_num_transactions_per_block = sum(num_transactions_per_block) / len(num_transactions_per_block) if num_transactions_per_block else 0
-        total_transactions = sum(num_transactions_per_block)
-        elapsed_time = current_time - self.start_time
-        confirmed_transactions_per_time = total_transactions / elapsed_time if elapsed_time > 0 else 0
-
-        # Calcular a recompensa total e média
-        total_rewards = sum(self.calculate_reward(len(block['transactions'])) for block in self.chain)
-        avg_reward_per_block = total_rewards / len(self.chain) if len(self.chain) > 1 else 0
+        """ Registra as métricas da blockchain (gravadas em segundo plano pelo metrics_log) """
+        # As somas vêm de self.metrics, mantidas bloco a bloco; aqui só se divide
+        elapsed_time = time() - self.start_time
+        confirmed_transactions_per_time = self.metrics.total_transactions / elapsed_time if elapsed_time > 0 else 0
 
         metrics = (
-            len(self.chain),
-            block_generation_time,
-            avg_num_transactions_per_block,
+            self.metrics.length,
+            self.metrics.block_generation_time,
+            self.metrics.avg_transactions_per_block,
             confirmed_transactions_per_time,
-            total_rewards  # Total de recompensas acumuladas
+            self.metrics.total_rewards  # Total de recompensas acumuladas
         )
 
-        # Adicionar métricas ao arquivo
-        with open(self.metrics_file, mode='a') as file:
-            file.write(', '.join(map(str, metrics)) + '\n')
+        self.metrics_log.write(metrics)
+
+class MiningJobQueue:
+    """ Fila de trabalhos de mineração executados por uma thread em segundo plano """
+
+    MAX_JOBS = 1000  # Quantidade de trabalhos concluídos mantidos para consulta
+    MAX_WAIT = 60  # Tempo máximo (s) de espera em uma consulta long-poll
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.jobs = OrderedDict()
+        self.pending = queue.Queue()
+        self.condition = threading.Condition()
+        self.worker = None
+
+    def submit(self, miner_address):
+        """ Agenda a mineração de um bloco e retorna o trabalho criado """
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'pendente',
+            'miner_address': miner_address,
+            'created_at': time(),
+        }
+        with self.condition:
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.MAX_JOBS:
+                self.jobs.popitem(last=False)
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+        self.pending.put(job['id'])
+        return dict(job)
+
+    def get(self, job_id, wait=0):
+        """ Retorna uma cópia do trabalho, aguardando até wait segundos pela conclusão """
+        deadline = time() + min(wait, self.MAX_WAIT)
+        with self.condition:
+            job = self.jobs.get(job_id)
+            while job is not None and job['status'] in ('pendente', 'minerando'):
+                remaining = deadline - time()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+                job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _update(self, job_id, **fields):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+            self.condition.notify_all()
+
+    def _run(self):
+        while True:
+            job_id = self.pending.get()
+            with self.condition:
+                job = self.jobs.get(job_id)
+            if job is None:  # Descartado da tabela antes de ser executado
+                continue
+            self._update(job_id, status='minerando')
+            try:
+                result = self._mine(job['miner_address'])
+            except Exception as e:
+                self._update(job_id, status='erro', error=str(e), finished_at=time())
+            else:
+                self._update(job_id, status='concluido', result=result, finished_at=time())
+
+    def _mine(self, miner_address):
+        while True:
+            with self.blockchain.lock:
+                if not len(self.blockchain.mempool):
+                    raise ValueError('Nenhuma transação para minerar')
+                last_proof = self.blockchain.last_block.proof
+                last_hash = self.blockchain.last_hash
+                difficulty = self.blockchain.next_difficulty()
+
+            # A busca roda sem o lock para não bloquear novas transações
+            proof = self.blockchain.proof_of_work(last_proof, difficulty)
+
+            with self.blockchain.lock:
+                # Compara hashes: com FileChainStore o mesmo topo pode voltar como outro objeto (cache)
+                if self.blockchain.last_hash != last_hash:
+                    continue  # A cadeia mudou durante a busca; minera sobre o novo topo
+                block = self.blockchain.new_block(proof, last_hash, miner_address)
+                break
+
+        return {
+            'message': 'Novo bloco minerado!',
+            'index': block.index,
+            'transactions': [transaction.to_dict() for transaction in block.transactions],
+            'proof': block.proof,
+            'previous_hash': block.previous_hash
+        }
 
 class RequestHandler(BaseHTTPRequestHandler):
-    blockchain = Blockchain()
+    blockchain = None  # Definidos por configure() antes de o servidor iniciar
+    mining_jobs = None
     port = 8000  # Porta do servidor, pode ser ajustada conforme necessário
+    protocol_version = 'HTTP/1.1'  # Conexões keep-alive e respostas em chunks
+    timeout = 60  # Fecha conexões keep-alive ociosas
+    disable_nagle_algorithm = True  # TCP_NODELAY: o corpo, escrito após os cabeçalhos, não espera o ACK do cliente
+    peers = PeerClient()  # Sessões keep-alive e pool de threads para consultar os vizinhos
+    peer_table = None  # Vizinhos conhecidos, definidos por configure()
+    gossip = None  # Anúncios de blocos e transações novos aos vizinhos, definido por configure()
+    fanout = 8  # Quantos dos melhores vizinhos são consultados em /nodes/resolve
+    resolve_deadline = 15  # Prazo (s) para todos os vizinhos responderem em /nodes/resolve
+    max_batch_bytes = 16 * 1024 * 1024  # Tamanho máximo do corpo de /transactions/batch
+    max_headers = 2000  # Cabeçalhos por resposta de /headers
 
-    def _send_response(self, response, status_code=200):
+    def end_headers(self):
+        # Sem threads, uma conexão mantida aberta bloquearia os demais clientes
+        if not getattr(self.server, 'keep_alive', True):
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+    def _send_response(self, response, status_code=200, headers=()):
+        self._send_bytes(json.dumps(response).encode(), 'application/json', status_code, headers)
+
+    def _send_bytes(self, data, content_type, status_code=200, headers=()):
         self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(json.dumps(response).encode())
+        self.wfile.write(data)
+
+    def _send_stream(self, parts, content_type, status_code=200):
+        """
+        Envia a resposta à medida que parts (iterável de bytes) é produzido,
+        sem montar o documento inteiro em memória. Usa Transfer-Encoding:
+        chunked em HTTP/1.1; clientes HTTP/1.0 recebem o corpo até o fim da
+        conexão.
+        """
+        chunked = self.request_version == 'HTTP/1.1'
+        self.send_response(status_code)
+        self.send_header('Content-type', content_type)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        try:
+            for part in parts:
+                if not part:
+                    continue
+                if chunked:
+                    self.wfile.write('{:x}\r\n'.format(len(part)).encode() + part + b'\r\n')
+                else:
+                    self.wfile.write(part)
+        except ChainChanged:
+            # O status já foi enviado: fecha a conexão sem o chunk final, e o cliente vê a resposta incompleta
+            self.close_connection = True
+            return
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def _accepts_binary(self):
+        """ O cliente pediu a codificação binária? JSON continua sendo o padrão """
+        return codificacao.CONTENT_TYPE in self.headers.get('Accept', '')
+
+    @staticmethod
+    def _int_param(query, name, default=None):
+        """ Parâmetro inteiro da query string; ValueError se não for um inteiro """
+        if name not in query:
+            return default
+        return int(query[name][0])
+
+    def _send_chain(self, query):
+        """ GET /chain?from=&to=&limit=: blocos do intervalo, enviados um a um """
+        try:
+            first, last, length = self.blockchain.block_range(
+                self._int_param(query, 'from', 1),
+                self._int_param(query, 'to'),
+                self._int_param(query, 'limit'),
+            )
+        except ValueError:
+            self.send_error(400, 'Parâmetros from, to e limit devem ser inteiros')
+            return
+        blocks = self.blockchain.iter_blocks(first, last)
+        if self._accepts_binary():
+            self._send_stream(codificacao.iter_encode_chain(blocks, last - first), codificacao.CONTENT_TYPE)
+        else:
+            self._send_stream(self._iter_chain_json(blocks, length, last), 'application/json')
+
+    @staticmethod
+    def _iter_chain_json(blocks, length, last):
+        yield b'{"chain": ['
+        separator = b''
+        for block in blocks:
+            yield separator + json.dumps(block.to_dict()).encode()
+            separator = b', '
+        next_index = last + 1 if last < length else None
+        yield '], "length": {}, "next": {}}}'.format(length, json.dumps(next_index)).encode()
 
     def do_GET(self):
-        if self.path == '/chain':
-            response = {
-                'chain': self.blockchain.get_chain(),
-                'length': len(self.blockchain.get_chain())
-            }
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/chain':
+            self._send_chain(query)
+        elif url.path == '/chain/tip':
+            with self.blockchain.lock:
+                response = {
+                    'length': len(self.blockchain.chain),
+                    'hash': self.blockchain.last_hash,
+                    'block': self.blockchain.last_block.to_dict(),
+                    'next_difficulty': self.blockchain.next_difficulty(),
+                    'work': self.blockchain.total_work()
+                }
             self._send_response(response)
-        elif self.path == '/mine':
-            if not self.blockchain.current_transactions:
+        elif url.path == '/headers':
+            # Só os cabeçalhos, para clientes leves: ?from=<index>&limit=<quantidade>
+            try:
+                limit = min(self._int_param(query, 'limit', self.max_headers), self.max_headers)
+                first, last, length = self.blockchain.block_range(self._int_param(query, 'from', 1), None, limit)
+            except ValueError:
+                self.send_error(400, 'Parâmetros from e limit devem ser inteiros')
+                return
+            with self.blockchain.lock:
+                response = {
+                    'headers': self.blockchain.block_headers(first, last),
+                    'length': length,
+                    'next_difficulty': self.blockchain.next_difficulty()
+                }
+            self._send_response(response)
+        elif url.path.startswith('/blocks/hash/'):
+            with self.blockchain.lock:  # Posição e leitura juntas: replace_suffix pode encurtar a cadeia
+                position = self.blockchain.block_position(url.path[len('/blocks/hash/'):])
+                block = self.blockchain.chain[position] if position is not None else None
+            if block is None:
+                self.send_error(404, 'Bloco não encontrado')
+                return
+            self._send_response(block.to_dict())
+        elif url.path.startswith('/blocks/'):
+            parts = url.path[len('/blocks/'):].split('/')
+            try:
+                index = int(parts[0])
+            except ValueError:
+                self.send_error(400, 'Índice de bloco inválido')
+                return
+            if len(parts) == 3 and parts[1] == 'proof':
+                # /blocks/<index>/proof/<hash da transação>: prova de inclusão de Merkle
+                response = self.blockchain.transaction_proof(index, parts[2])
+                if response is None:
+                    self.send_error(404, 'Transação não encontrada no bloco (ou bloco sem raiz de Merkle)')
+                    return
+                self._send_response(response)
+                return
+            if len(parts) != 1:
+                self.send_error(404, 'Not Found')
+                return
+            with self.blockchain.lock:
+                first, last, _ = self.blockchain.block_range(index, index)
+                block = self.blockchain.chain[first] if index >= 1 and first != last else None
+            if block is None:
+                self.send_error(404, 'Bloco não encontrado')
+                return
+            self._send_response(block.to_dict())
+        elif url.path == '/mine':
+            if not len(self.blockchain.mempool):
                 self.send_error(400, 'Nenhuma transação para minerar')
                 return
 
-            last_proof = self.blockchain.last_block['proof']
-            proof = self.blockchain.proof_of_work(last_proof)
-            previous_hash = self.blockchain.hash(self.blockchain.last_block)
-            
-            # Adiciona o endereço do minerador
+            # A prova de trabalho roda em segundo plano; o cliente consulta /mine/<id>
             miner_address = self.headers.get('Miner-Address', 'unknown')
-            block = self.blockchain.new_block(proof, previous_hash, miner_address)
-            
+            job = self.mining_jobs.submit(miner_address)
             response = {
-                'message': 'Novo bloco minerado!',
-                'index': block['index'],
-                'transactions': block['transactions'],
-                'proof': block['proof'],
-                'previous_hash': block['previous_hash']
+                'message': 'Mineração agendada',
+                'job_id': job['id'],
+                'status': job['status'],
+                'status_url': '/mine/{}'.format(job['id'])
             }
-            self._send_response(response)
-        elif self.path == '/nodes/resolve':
+            self._send_response(response, 202)
+        elif url.path.startswith('/mine/'):
+            job_id = url.path[len('/mine/'):]
+            try:
+                wait = float(query.get('wait', ['0'])[0])
+            except ValueError:
+                self.send_error(400, 'Parâmetro wait inválido')
+                return
+            job = self.mining_jobs.get(job_id, wait)
+            if job is None:
+                self.send_error(404, 'Trabalho de mineração não encontrado')
+                return
+            self._send_response(job)
+        elif url.path == '/nodes/resolve':
             response = self.resolve_conflicts()
             self._send_response(response)
+        elif url.path == '/nodes':
+            self._send_response({'nodes': self.peer_table.snapshot()})
+        elif url.path.startswith('/address/'):
+            address, _, resource = url.path[len('/address/'):].rpartition('/')
+            address = unquote(address)
+            if resource == 'balance':
+                response = self.blockchain.address_balance(address)
+            elif resource == 'transactions':
+                try:
+                    limit = self._int_param(query, 'limit', 100)
+                except ValueError:
+                    self.send_error(400, 'Parâmetro limit deve ser inteiro')
+                    return
+                response = {'transactions': self.blockchain.address_transactions(address, limit)}
+            else:
+                self.send_error(404, 'Not Found')
+                return
+            response['address'] = address
+            self._send_response(response)
+        elif url.path.startswith('/transactions/'):
+            transaction = self.blockchain.pending_transaction(url.path[len('/transactions/'):])
+            if transaction is None:
+                self.send_error(404, 'Transação pendente não encontrada')
+                return
+            self._send_response(transaction.to_dict())
         else:
             self.send_error(404, 'Not Found')
 
+    def _read_json(self):
+        content_length = int(self.headers['Content-Length'])
+        return json.loads(self.rfile.read(content_length).decode())
+
     def do_POST(self):
-        if self.path == '/transactions/new':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            values = json.loads(post_data.decode())
-            required = ['sender', 'recipient', 'amount']
-            if not all(k in values for k in required):
-                self.send_error(400, 'Faltam parâmetros')
-                return
-            index = self.blockchain.new_transaction(values['sender'], values['recipient'], values['amount'])
-            response = {'message': 'Transação adicionada ao bloco {}'.format(index)}
+        if self.path == '/nodes/register':
+            nodes = self._read_json().get('nodes')
+            if not isinstance(nodes, list):
+                self.send_error(400, 'Informe uma lista de nós em "nodes"')
+                return
+            added = [node for node in nodes if isinstance(node, str) and self.peer_table.add(node)]
+            response = {
+                'message': 'Novos nós adicionados' if added else 'Nenhum nó novo',
+                'added': added,
+                'total_nodes': self.peer_table.urls()
+            }
+            self._send_response(response, 201)
+        elif self.path == '/chain/locate':
+            # Sincronização: o vizinho envia seu locator e recebe o ancestral comum e o topo local
+            locator = self._read_json().get('locator', [])
+            with self.blockchain.lock:
+                response = {
+                    'ancestor': self.blockchain.find_ancestor(locator),
+                    'length': len(self.blockchain.chain),
+                    'hash': self.blockchain.last_hash,
+                    'work': self.blockchain.total_work()
+                }
+            self._send_response(response)
+        elif self.path == '/mine/submit':
+            # Prova encontrada pelo minerador: conferida com um único hash e anexada se ainda for atual
+            values = self._read_json()
+            proof = values.get('proof')
+            if not isinstance(values.get('previous_hash'), str) or isinstance(proof, bool) or \
+                    not isinstance(proof, int):
+                self.send_error(400, 'Informe "proof" (inteiro) e "previous_hash"')
+                return
+            try:
+                block = self.blockchain.submit_proof(proof, values['previous_hash'],
+                                                     values.get('miner_address', 'unknown'))
+            except StaleWork as e:
+                self.send_error(409, str(e))
+                return
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            response = {
+                'message': 'Novo bloco minerado!',
+                'index': block.index,
+                'transactions': [transaction.to_dict() for transaction in block.transactions],
+                'proof': block.proof,
+                'previous_hash': block.previous_hash
+            }
             self._send_response(response, 201)
+        elif self.path == '/transactions/new':
+            status, message = self._add_transaction(self._read_json())
+            if status == 201:
+                self._send_response({'message': message}, 201)
+            elif status == 503:
+                self._send_response({'message': message}, 503, [('Retry-After', '5')])
+            else:
+                self.send_error(status, message)
+        elif self.path == '/transactions/batch':
+            # Lote de transações em um array JSON ou em NDJSON (um objeto por linha)
+            content_length = int(self.headers['Content-Length'])
+            if content_length > self.max_batch_bytes:
+                self.close_connection = True
+                self.send_error(413, 'Lote maior que {} bytes'.format(self.max_batch_bytes))
+                return
+            body = self.rfile.read(content_length).decode()
+            if 'ndjson' in self.headers.get('Content-Type', ''):
+                items = []
+                for line in body.splitlines():
+                    if line.strip():
+                        try:
+                            items.append(json.loads(line))
+                        except ValueError:
+                            items.append(None)  # Linha inválida: recusada no resultado do item
+            else:
+                try:
+                    items = json.loads(body)
+                except ValueError:
+                    items = None
+                if not isinstance(items, list):
+                    self.send_error(400, 'Informe um array JSON de transações')
+                    return
+            with self.blockchain.lock:  # Uma única aquisição do lock para o lote inteiro
+                results = [self._add_transaction(values) for values in items]
+            response = {
+                'accepted': sum(status == 201 for status, _ in results),
+                'results': [{'status': status, 'message': message} for status, message in results]
+            }
+            full = any(status == 503 for status, _ in results)
+            self._send_response(response, 200, [('Retry-After', '5')] if full else ())
+        elif self.path == '/inv':
+            # Anúncio de inventário: os itens ainda não vistos são buscados em segundo plano no remetente,
+            # desde que ele seja um vizinho conhecido (registrado por /nodes/register ou semente)
+            values = self._read_json()
+            origin = values.get('from')
+            items = values.get('items')
+            if not isinstance(origin, str) or not isinstance(items, list):
+                self.send_error(400, 'Informe "from" e uma lista de itens em "items"')
+                return
+            origin = origin.rstrip('/')
+            if not self.peer_table.known(origin):
+                self.send_error(403, 'Vizinho desconhecido; registre-se em /nodes/register')
+                return
+            accepted = self.gossip.receive(origin, [item for item in items if isinstance(item, dict)])
+            for item in accepted:
+                self.peers.executor.submit(self._fetch_inventory, origin, item)
+            self._send_response({'accepted': len(accepted)}, 202)
         else:
+            self.close_connection = True  # O corpo não lido não pode ser confundido com a próxima requisição
             self.send_error(404, 'Not Found')
 
+    def _add_transaction(self, values):
+        """ Valida e adiciona uma transação recebida; retorna (status HTTP, mensagem) """
+        required = ['sender', 'recipient', 'amount']
+        if not isinstance(values, dict) or not all(k in values for k in required):
+            return 400, 'Faltam parâmetros'
+        try:
+            index = self.blockchain.new_transaction(values['sender'], values['recipient'], values['amount'],
+                                                    values.get('fee', 0))
+        except ValueError as e:
+            return 400, str(e)
+        except MempoolFull as e:
+            return 503, str(e)
+        if index is None:
+            return 409, 'Transação já pendente'
+        return 201, 'Transação adicionada ao bloco {}'.format(index)
+
     def resolve_conflicts(self):
         neighbours = self.get_neighbours()
-        new_chain = None
-        max_length = len(self.blockchain.get_chain())
+        best = None  # (fork, blocos, hashes) da cadeia válida com mais trabalho encontrada
+        best_gain = 0
 
-        for neighbour in neighbours:
-            try:
-                response = requests.get('{}/chain'.format(neighbour))
-                if response.status_code == 200:
-                    length = response.json()['length']
-                    chain = response.json()['chain']
-                    if length > max_length and self.valid_chain(chain):
-                        max_length = length
-                        new_chain = chain
-            except requests.RequestException:
+        # Todos os vizinhos são consultados ao mesmo tempo; quem não responder até o prazo fica de fora
+        candidates = self.peers.map(self._scored_sync, neighbours, self.resolve_deadline)
+        for candidate in candidates.values():
+            if candidate is None:
                 continue
+            gain = self.blockchain.work_gain(candidate[0], candidate[1])
+            if gain > best_gain:
+                best, best_gain = candidate, gain
 
-        if new_chain:
-            self.blockchain.replace_chain(new_chain)
-            return {'message': 'Cadeia substituída com sucesso', 'new_chain': new_chain}
+        if best and self.blockchain.replace_suffix(*best):
+            fork, blocks, _ = best
+            return {
+                'message': 'Cadeia substituída com sucesso',
+                'length': fork + len(blocks),
+                'new_blocks': [block.to_dict() for block in blocks]
+            }
         else:
             return {'message': 'Nenhuma substituição necessária'}
 
-    def valid_chain(self, chain):
-        last_block = chain[0]
-        index = 1
+    def _scored_sync(self, neighbour):
+        """ sync_candidate registrando a falha do vizinho na tabela de pares """
+        try:
+            return self.sync_candidate(neighbour)
+        except Exception:
+            self.peer_table.record_failure(neighbour)
+            raise
 
-        while index < len(chain):
-            block = chain[index]
-            if block['previous_hash'] != self.hash(last_block):
-                return False
-            if not self.valid_proof(last_block['proof'], block['proof']):
-                return False
-            last_block = block
-            index += 1
+    def sync_candidate(self, neighbour):
+        """
+        Sincronização por cabeçalhos com um vizinho: compara o topo, localiza o
+        ancestral comum e baixa e valida apenas os blocos posteriores a ele.
+        Retorna (fork, blocos, hashes) se o vizinho tiver uma cadeia válida
+        com mais trabalho acumulado que a local, ou None.
+        """
+        response = self.peers.post(neighbour, '/chain/locate', json={'locator': self.blockchain.locator()})
+        if response.status_code == 404:  # Vizinho antigo, sem /chain/locate
+            return self._full_chain_candidate(neighbour)
+        response.raise_for_status()
+        data = response.json()
+        self.peer_table.record_success(neighbour, data['length'], data['hash'])
+        if self.blockchain.block_position(data['hash']) is not None:
+            return None  # O topo do vizinho já está na cadeia local
+        # O trabalho informado pelo vizinho só serve para não baixar à toa; o dos blocos é recalculado
+        work = data.get('work')
+        if isinstance(work, (int, float)) and work <= self.blockchain.total_work():
+            return None
+
+        fork = data['ancestor']  # Quantidade de blocos em comum
+        blocks = self._fetch_blocks(neighbour, fork + 1)
+        if not blocks or self.blockchain.work_gain(fork, blocks) <= 0:
+            return None
+        if fork == 0:
+            hashes = self.blockchain.validate_chain(blocks)
+        else:
+            with self.blockchain.lock:
+                previous = self.blockchain.chain[fork - 1]
+                previous_hash = self.blockchain.store.block_hash(fork - 1)
+            hashes = self.blockchain.validate_chain(blocks, previous, previous_hash)
+        return (fork, blocks, hashes) if hashes is not None else None
+
+    def _fetch_blocks(self, neighbour, start):
+        """ Blocos do vizinho a partir do index start, no formato binário quando disponível """
+        response = self.peers.get(neighbour, '/chain', params={'from': start},
+                                  headers={'Accept': codificacao.CONTENT_TYPE})
+        response.raise_for_status()
+        if response.headers.get('Content-type') == codificacao.CONTENT_TYPE:
+            return codificacao.decode_chain(response.content)
+        return [Block.from_dict(block) for block in response.json()['chain']]
+
+    def _full_chain_candidate(self, neighbour):
+        chain = self._fetch_blocks(neighbour, 1)
+        if not chain:
+            return None
+        hashes = self.blockchain.validate_chain(chain)
+        if hashes is None:
+            return None
+        fork = 0
+        with self.blockchain.lock:
+            while fork < min(len(self.blockchain.store), len(hashes)) and \
+                    self.blockchain.store.block_hash(fork) == hashes[fork]:
+                fork += 1
+        if self.blockchain.work_gain(fork, chain[fork:]) <= 0:
+            return None
+        return fork, chain[fork:], hashes[fork:]
+
+    def _fetch_inventory(self, neighbour, item):
+        """ Busca no vizinho um item anunciado em /inv e o incorpora (o que o reanuncia) """
+        accepted = False
+        try:
+            if item['type'] == 'tx':
+                response = self.peers.get(neighbour, '/transactions/' + item['hash'])
+                response.raise_for_status()
+                transaction = Transaction.from_dict(response.json())
+                if transaction.hash() == item['hash']:
+                    try:
+                        self.blockchain.add_transaction(transaction)
+                        accepted = True  # Nova ou já pendente
+                    except MempoolFull:
+                        pass  # Sem espaço aqui; o vizinho não tem culpa
+                return
+
+            response = self.peers.get(neighbour, '/blocks/hash/' + item['hash'])
+            response.raise_for_status()
+            block = Block.from_dict(response.json())
+            if block.hash() != item['hash']:
+                return
+            self.peer_table.record_success(neighbour, block.index, item['hash'])
+            if self.blockchain.add_block(block):
+                accepted = True
+                return
+            # Não continua o topo local: se for de outra bifurcação, sincroniza se ela tiver mais trabalho
+            if self.blockchain.block_position(item['hash']) is None:
+                candidate = self.sync_candidate(neighbour)
+                if candidate is not None and self.blockchain.replace_suffix(*candidate):
+                    accepted = True
+        except Exception:
+            self.peer_table.record_failure(neighbour)
+        finally:
+            self.gossip.fetched(item['hash'], accepted)
 
-        return True
+    def valid_chain(self, chain):
+        return self.blockchain.validate_chain(chain) is not None
 
     def get_neighbours(self):
-        return [
-            'http://localhost:{}'.format(self.port + 1),
-            'http://localhost:{}'.format(self.port + 2)
+        return self.peer_table.best(self.fanout)
+
+class _BufferedRequestMixin:
+    """ Executa o handler sobre buffers em memória em vez de um socket """
+
+    def setup(self):
+        self.rfile = BytesIO(self.request)
+        self.wfile = BytesIO()
+
+    def handle(self):
+        self.handle_one_request()
+
+    def finish(self):
+        pass
+
+class AsyncioHTTPServer:
+    """
+    Servidor HTTP baseado em asyncio.
+
+    As conexões são atendidas pelo laço de eventos e cada requisição completa
+    é entregue ao mesmo RequestHandler usado pelos outros modos, executado em
+    um pool de threads (os handlers fazem I/O bloqueante, como em
+    resolve_conflicts). A resposta é montada em memória e enviada de volta
+    pela conexão assíncrona.
+    """
+
+    def __init__(self, server_address, handler_class, max_workers=32):
+        self.server_address = server_address
+        self.handler_class = type(
+            'Buffered' + handler_class.__name__, (_BufferedRequestMixin, handler_class), {}
+        )
+        self.executor = ThreadPoolExecutor(max_workers)
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        host, port = self.server_address
+        server = await asyncio.start_server(self._handle_connection, host or None, port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        client_address = writer.get_extra_info('peername')
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                body = await reader.readexactly(self._content_length(head))
+                response, close = await loop.run_in_executor(
+                    self.executor, self._process, head + body, client_address
+                )
+                writer.write(response)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _content_length(head):
+        for line in head.split(b'\r\n'):
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                return int(value.strip())
+        return 0
+
+    def _process(self, request, client_address):
+        handler = self.handler_class(request, client_address, self)
+        return handler.wfile.getvalue(), handler.close_connection
+
+class SingleThreadHTTPServer(HTTPServer):
+    """ Atende uma requisição por vez e fecha a conexão ao final de cada uma """
+    keep_alive = False
+
+class ConcurrentHTTPServer(ThreadingHTTPServer):
+    """ Uma thread por conexão, com fila de conexões pendentes maior que a padrão (5) """
+    request_queue_size = 128
+
+SERVER_CLASSES = {
+    'simples': SingleThreadHTTPServer,
+    'threads': ConcurrentHTTPServer,
+    'asyncio': AsyncioHTTPServer,
+}
+
+def configure(handler_class=RequestHandler, blockchain=None, seeds=None, own_url=None):
+    """ Associa a blockchain (e sua fila de mineração) e a tabela de vizinhos ao handler """
+    handler_class.blockchain = blockchain or Blockchain()
+    handler_class.mining_jobs = MiningJobQueue(handler_class.blockchain)
+    if seeds is None:  # Sem sementes, usa os vizinhos locais de sempre (porta + 1 e porta + 2)
+        seeds = [
+            'http://localhost:{}'.format(handler_class.port + 1),
+            'http://localhost:{}'.format(handler_class.port + 2)
         ]
+    # Sem endereço público, os vizinhos locais buscam os itens anunciados em localhost
+    own_url = own_url or 'http://localhost:{}'.format(handler_class.port)
+    handler_class.peer_table = PeerTable(handler_class.peers, seeds, own_url)
+    handler_class.gossip = Gossip(handler_class.peers, handler_class.peer_table, own_url, handler_class.fanout)
+    handler_class.blockchain.listeners.append(handler_class.gossip.announce)
 
-def run(server_class=HTTPServer, handler_class=RequestHandler, port=8000):
+def run(server_class=ConcurrentHTTPServer, handler_class=RequestHandler, port=8000, blockchain=None,
+        seeds=None, own_url=None):
+    if blockchain is not None or handler_class.blockchain is None:
+        configure(handler_class, blockchain, seeds, own_url)
     server_address = ('', port)
     httpd = server_class(server_address, handler_class)
+    handler_class.peer_table.start_probing()
     print('Iniciando o servidor na porta {}...'.format(port))
     httpd.serve_forever()
 
 if __name__ == "__main__":
-    run(port=RequestHandler.port)
+    parser = argparse.ArgumentParser(description='Nó da blockchain')
+    parser.add_argument('--porta', type=int, default=RequestHandler.port)
+    parser.add_argument('--servidor', choices=sorted(SERVER_CLASSES), default='threads',
+                        help='Modo de atendimento das requisições HTTP')
+    parser.add_argument('--dados', help='Diretório onde a cadeia é persistida (padrão: apenas em memória)')
+    parser.add_argument('--fsync', action='store_true', help='Força fsync a cada bloco gravado')
+    parser.add_argument('--pares', nargs='*', metavar='URL',
+                        help='Vizinhos iniciais (padrão: localhost na porta + 1 e porta + 2)')
+    parser.add_argument('--endereco', metavar='URL', help='URL pública deste nó, anunciada aos vizinhos')
+    parser.add_argument('--fanout', type=int, default=RequestHandler.fanout,
+                        help='Quantos vizinhos consultar em /nodes/resolve')
+    parser.add_argument('--tempo-bloco', type=float, default=30.0,
+                        help='Intervalo alvo (s) entre blocos; deve ser o mesmo em todos os nós')
+    parser.add_argument('--janela-dificuldade', type=int, default=10,
+                        help='A dificuldade é ajustada a cada quantos blocos; deve ser o mesmo em todos os nós')
+    parser.add_argument('--formato-registro', choices=FORMATS, default='text',
+                        help='Formato dos arquivos de recompensas e de métricas')
+    parser.add_argument('--fsync-registro', choices=FSYNC_POLICIES, default='none',
+                        help='Quando os registros de recompensas e de métricas vão para o disco')
+    args = parser.parse_args()
+    RequestHandler.port = args.porta
+    RequestHandler.fanout = args.fanout
+    store = FileChainStore(args.dados, fsync=args.fsync) if args.dados else None
+    retarget = DifficultyRetarget(window=args.janela_dificuldade, block_time=args.tempo_bloco)
+    log_options = {'format': args.formato_registro, 'fsync': args.fsync_registro}
+    run(server_class=SERVER_CLASSES[args.servidor], port=args.porta,
+        blockchain=Blockchain(store=store, retarget=retarget, log_options=log_options), seeds=args.pares,
+        own_url=args.endereco)
@@ -0,0 +1,173 @@
+"""
+Tipos compactos para blocos e transações.
+
+Com __slots__ cada instância guarda apenas os valores dos campos, sem o
+dicionário por objeto que um dict (ou uma classe comum) carrega. A forma em
+dict, usada pela API HTTP e pelo hash dos blocos, é gerada sob demanda por
+to_dict, com as mesmas chaves de antes.
+
+Blocos com merkle_root têm o hash calculado só sobre o cabeçalho (a raiz
+representa as transações); blocos antigos, sem raiz, continuam com o hash
+sobre o bloco inteiro. Do mesmo modo, difficulty só aparece no dict e no
+cabeçalho dos blocos que a registram.
+"""
+import hashlib
+import json
+
+from merkle import merkle_root
+from mineracao import DEFAULT_DIFFICULTY
+
+
+def header_hash(header):
+    """ Hash de um bloco com raiz de Merkle a partir só do cabeçalho (Block.header) """
+    return hashlib.sha256(json.dumps(header, sort_keys=True).encode()).hexdigest()
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class Transaction:
+    __slots__ = ('sender', 'recipient', 'amount', 'fee')
+
+    def __init__(self, sender, recipient, amount, fee=0):
+        self.sender = sender
+        self.recipient = recipient
+        self.amount = amount
+        self.fee = fee  # Taxa opcional; define a prioridade na mempool
+
+    def to_dict(self):
+        data = {
+            'sender': self.sender,
+            'recipient': self.recipient,
+            'amount': self.amount,
+        }
+        if self.fee:  # Sem taxa o dict (e portanto o hash) é o mesmo de antes
+            data['fee'] = self.fee
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['sender'], data['recipient'], data['amount'], data.get('fee', 0))
+
+    def hash(self):
+        """ SHA-256 do JSON da transação com as chaves ordenadas """
+        transaction_string = json.dumps(self.to_dict(), sort_keys=True).encode()
+        return hashlib.sha256(transaction_string).hexdigest()
+
+    def size(self):
+        """ Tamanho aproximado em bytes, usado no limite da mempool """
+        return len(json.dumps(self.to_dict()))
+
+    def __eq__(self, other):
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        if self.fee:
+            return 'Transaction({!r}, {!r}, {!r}, fee={!r})'.format(self.sender, self.recipient, self.amount, self.fee)
+        return 'Transaction({!r}, {!r}, {!r})'.format(self.sender, self.recipient, self.amount)
+
+
+class Block:
+    __slots__ = ('index', 'timestamp', 'transactions', 'proof', 'previous_hash', 'merkle_root', 'difficulty')
+
+    def __init__(self, index, timestamp, transactions, proof, previous_hash, merkle_root=None, difficulty=None):
+        self.index = index
+        self.timestamp = timestamp
+        self.transactions = transactions
+        self.proof = proof
+        self.previous_hash = previous_hash
+        self.merkle_root = merkle_root  # Raiz de Merkle das transações; None em blocos antigos
+        self.difficulty = difficulty  # Dificuldade da prova deste bloco; None em blocos antigos
+
+    @classmethod
+    def build(cls, index, timestamp, transactions, proof, previous_hash, difficulty=None):
+        """ Novo bloco com a raiz de Merkle calculada (uma única vez) a partir das transações """
+        return cls(index, timestamp, transactions, proof, previous_hash, cls.compute_merkle_root(transactions),
+                   difficulty)
+
+    @property
+    def effective_difficulty(self):
+        """ Dificuldade usada para validar a prova (a padrão para blocos antigos) """
+        return DEFAULT_DIFFICULTY if self.difficulty is None else self.difficulty
+
+    @staticmethod
+    def compute_merkle_root(transactions):
+        return merkle_root([transaction.hash() for transaction in transactions])
+
+    def to_dict(self):
+        data = {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'transactions': [transaction.to_dict() for transaction in self.transactions],
+            'proof': self.proof,
+            'previous_hash': self.previous_hash,
+        }
+        if self.merkle_root is not None:
+            data['merkle_root'] = self.merkle_root
+        if self.difficulty is not None:
+            data['difficulty'] = self.difficulty
+        return data
+
+    def header(self):
+        """ Campos cobertos pelo hash de um bloco com raiz de Merkle """
+        header = {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'merkle_root': self.merkle_root,
+            'proof': self.proof,
+            'previous_hash': self.previous_hash,
+        }
+        if self.difficulty is not None:
+            header['difficulty'] = self.difficulty
+        return header
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Bloco a partir do dict recebido de um vizinho. Levanta ValueError se
+        um campo não tiver o tipo que a codificação binária e o hash esperam
+        (ex.: index 2.0 passaria por 2 na validação mas não seria gravado).
+        """
+        if not _is_int(data['index']) or not _is_int(data['proof']):
+            raise ValueError('index e proof do bloco devem ser inteiros')
+        if type(data['timestamp']) is not float:
+            raise ValueError('timestamp do bloco deve ser um número de ponto flutuante')
+        root = data.get('merkle_root')
+        if not isinstance(data['previous_hash'], str) or (root is not None and not isinstance(root, str)):
+            raise ValueError('previous_hash e merkle_root do bloco devem ser strings')
+        if data.get('difficulty') is not None and not _is_int(data['difficulty']):
+            raise ValueError('difficulty do bloco deve ser um inteiro')
+        if not isinstance(data['transactions'], list):
+            raise ValueError('transactions do bloco deve ser uma lista')
+        return cls(
+            data['index'],
+            data['timestamp'],
+            [Transaction.from_dict(transaction) for transaction in data['transactions']],
+            data['proof'],
+            data['previous_hash'],
+            root,
+            data.get('difficulty'),
+        )
+
+    def hash(self):
+        """ SHA-256 do JSON do cabeçalho (ou do bloco inteiro, se não tiver raiz) com as chaves ordenadas """
+        if self.merkle_root is not None:
+            return header_hash(self.header())
+        block_string = json.dumps(self.to_dict(), sort_keys=True).encode()
+        return hashlib.sha256(block_string).hexdigest()
+
+    def valid_merkle_root(self):
+        """ Confere a raiz contra as transações (blocos antigos, sem raiz, não têm o que conferir) """
+        return self.merkle_root is None or self.merkle_root == self.compute_merkle_root(self.transactions)
+
+    def __eq__(self, other):
+        if not isinstance(other, Block):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'Block(index={!r}, proof={!r}, transactions={})'.format(
+            self.index, self.proof, len(self.transactions))
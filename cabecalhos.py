@@ -0,0 +1,107 @@
+"""
+Cache de cabeçalhos para clientes leves.
+
+Em vez de baixar /chain inteira, o cliente guarda os cabeçalhos (index,
+timestamp, proof, previous_hash, merkle_root, quantidade de transações e
+hash) e a cada sync() pede a /headers apenas os posteriores ao último que
+já conhece. Cada cabeçalho novo é conferido: o elo com o anterior, a prova
+de trabalho na dificuldade declarada e, quando há raiz de Merkle, o
+próprio hash. next_difficulty guarda a dificuldade exigida do próximo
+bloco, informada pelo nó.
+
+Se o nó trocou de cadeia e o primeiro cabeçalho novo não se liga ao topo
+do cache, os cabeçalhos mais recentes são descartados (1, 2, 4, ...) até
+reencontrar o ponto em comum.
+"""
+import requests
+
+from blocos import header_hash
+from mineracao import DEFAULT_DIFFICULTY, valid_proof
+
+_HEADER_FIELDS = ('index', 'timestamp', 'merkle_root', 'proof', 'previous_hash', 'difficulty')
+
+
+class HeaderError(Exception):
+    """ Cabeçalho recebido que não se liga à cadeia ou não confere """
+
+
+class HeaderCache:
+    """ Últimos max_headers cabeçalhos da cadeia de um nó, sincronizados incrementalmente """
+
+    def __init__(self, base_url, session=None, max_headers=10000, timeout=10):
+        self.base_url = base_url
+        self.session = session or requests.Session()
+        self.max_headers = max_headers
+        self.timeout = timeout
+        self.headers = []
+        self.offset = 0  # Quantidade de cabeçalhos mais antigos já descartados do cache
+        self.next_difficulty = DEFAULT_DIFFICULTY
+
+    @property
+    def height(self):
+        return self.offset + len(self.headers)
+
+    def tip(self):
+        return self.headers[-1] if self.headers else None
+
+    def header(self, index):
+        position = index - 1 - self.offset
+        return self.headers[position] if 0 <= position < len(self.headers) else None
+
+    def recent(self, count):
+        return self.headers[-count:] if count > 0 else []
+
+    def sync(self):
+        """ Baixa os cabeçalhos novos do nó e retorna quantos foram adicionados """
+        added = 0
+        back = 1
+        while True:
+            response = self.session.get('{}/headers'.format(self.base_url), params={'from': self.height + 1},
+                                        timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            self.next_difficulty = data.get('next_difficulty', DEFAULT_DIFFICULTY)
+            headers = data['headers']
+            if not headers:
+                if data['length'] >= self.height:
+                    return added
+                self._rewind(self.height - data['length'])  # O nó agora tem uma cadeia mais curta
+                continue
+            try:
+                for header in headers:
+                    self._append(header)
+                    added += 1
+            except HeaderError:
+                if added or not self.headers:
+                    raise
+                self._rewind(back)  # Troca de cadeia no nó: volta até o ponto em comum
+                back *= 2
+                continue
+            if self.height >= data['length']:
+                return added
+
+    def _rewind(self, count):
+        del self.headers[max(len(self.headers) - count, 0):]
+        if not self.headers:
+            self.offset = 0
+
+    def _append(self, header):
+        if header['index'] != self.height + 1:
+            raise HeaderError('Cabeçalho fora de ordem: {}'.format(header['index']))
+        previous = self.tip()
+        if previous is not None:
+            if header['previous_hash'] != previous['hash']:
+                raise HeaderError('Cabeçalho {} não se liga ao anterior'.format(header['index']))
+            difficulty = header.get('difficulty')
+            if not valid_proof(previous['proof'], header['proof'],
+                               DEFAULT_DIFFICULTY if difficulty is None else difficulty):
+                raise HeaderError('Prova de trabalho inválida no cabeçalho {}'.format(header['index']))
+        if header.get('merkle_root') is not None:
+            # Blocos antigos, sem raiz, só podem ter o hash conferido com o bloco inteiro
+            if header_hash({field: header[field] for field in _HEADER_FIELDS if field in header}) != header['hash']:
+                raise HeaderError('Hash inválido no cabeçalho {}'.format(header['index']))
+        self.headers.append(header)
+        if len(self.headers) > self.max_headers:
+            drop = len(self.headers) - self.max_headers
+            del self.headers[:drop]
+            self.offset += drop
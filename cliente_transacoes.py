@@ -1,8 +1,13 @@
+import argparse
 import requests
 import random
 import time
 import string
 
+from blocos import Transaction
+from cabecalhos import HeaderCache, HeaderError
+from merkle import verify_proof
+
 class TransactionClient:
     BASE_URL = 'http://192.168.100.215:8000'
 
@@ -12,6 +17,8 @@ class TransactionClient:
         self.total_response_time = 0.0
         self.start_time = time.time()
         self.client_name = self.generate_random_name()  # Gerar nome aleatório para o cliente
+        self.session = requests.Session()  # Conexão keep-alive reaproveitada entre as requisições
+        self.headers = HeaderCache(self.BASE_URL, self.session)  # Cabeçalhos já baixados da cadeia
 
     def generate_random_name(self):
         """ Gera um nome aleatório para o cliente """
@@ -21,7 +28,7 @@ class TransactionClient:
         """ Adiciona uma nova transação à blockchain """
         url = '{}/transactions/new'.format(self.BASE_URL)
         start_time = time.time()
-        response = requests.post(url, json={
+        response = self.session.post(url, json={
             'sender': sender,
             'recipient': recipient,
             'amount': amount
@@ -39,25 +46,81 @@ class TransactionClient:
 
         return response.status_code
 
-    def view_chain(self):
-        """ Visualiza a cadeia de blocos atual """
-        url = '{}/chain'.format(self.BASE_URL)
+    def create_transactions(self, transactions):
+        """ Envia várias transações (sender, recipient, amount) em uma única requisição a /transactions/batch """
+        url = '{}/transactions/batch'.format(self.BASE_URL)
+        body = [{'sender': sender, 'recipient': recipient, 'amount': amount}
+                for sender, recipient, amount in transactions]
         start_time = time.time()
-        response = requests.get(url)
+        response = self.session.post(url, json=body)
         response_time = time.time() - start_time
 
         self.total_requests += 1
         self.total_response_time += response_time
 
-        if response.status_code == 200:
-            data = response.json()
-            print('Cadeia de blocos:')
-            for block in data['chain']:
-                print(block)
-            print('Comprimento da cadeia:', data['length'])
-        else:
-            print('Erro ao visualizar a cadeia:', response.text)
+        if response.status_code != 200:
+            print('Erro ao enviar o lote de transações:', response.text)
+            self.error_count += len(body)
+            return 0
+
+        data = response.json()
+        for result in data['results']:
+            if result['status'] != 201:
+                print('Erro ao adicionar transação:', result['message'])
+                self.error_count += 1
+        print('{} de {} transações adicionadas'.format(data['accepted'], len(body)))
+        return data['accepted']
+
+    def verify_transaction(self, block_index, sender, recipient, amount, fee=0):
+        """
+        Confere que a transação está no bloco block_index baixando apenas a
+        prova de Merkle (alguns hashes) em vez do bloco inteiro. A prova é
+        conferida contra a raiz do cabeçalho já validado no cache, nunca
+        contra o cabeçalho enviado junto com ela.
+        """
+        cached = self.headers.header(block_index)
+        if cached is None:
+            try:
+                self.headers.sync()
+            except (requests.exceptions.RequestException, HeaderError) as e:
+                print('Erro ao sincronizar os cabeçalhos:', e)
+                return False
+            cached = self.headers.header(block_index)
+        if cached is None or cached.get('merkle_root') is None:
+            return False  # Bloco fora do cache ou antigo, sem raiz de Merkle
+
+        transaction_hash = Transaction(sender, recipient, amount, fee).hash()
+        url = '{}/blocks/{}/proof/{}'.format(self.BASE_URL, block_index, transaction_hash)
+        start_time = time.time()
+        response = self.session.get(url)
+        response_time = time.time() - start_time
+
+        self.total_requests += 1
+        self.total_response_time += response_time
+
+        if response.status_code != 200:
+            return False
+        data = response.json()
+        return data['hash'] == cached['hash'] and verify_proof(transaction_hash, data['proof'],
+                                                               cached['merkle_root'])
+
+    def view_chain(self, limit=10):
+        """ Visualiza os cabeçalhos dos últimos blocos, baixando só os que ainda não estão no cache """
+        start_time = time.time()
+        try:
+            self.headers.sync()
+        except (requests.exceptions.RequestException, HeaderError) as e:
+            print('Erro ao visualizar a cadeia:', e)
             self.error_count += 1
+            return
+        finally:
+            self.total_requests += 1
+            self.total_response_time += time.time() - start_time
+
+        print('Cadeia de blocos:')
+        for header in self.headers.recent(limit):
+            print(header)
+        print('Comprimento da cadeia:', self.headers.height)
 
     def generate_random_transaction(self):
         """ Gera uma transação aleatória """
@@ -78,16 +141,25 @@ class TransactionClient:
             file.flush()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cliente que gera transações aleatórias')
+    parser.add_argument('--lote', action='store_true',
+                        help='Envia as transações de cada rodada em uma única requisição')
+    args = parser.parse_args()
     client = TransactionClient()
 
     # Envia um número aleatório de transações a cada 30 segundos
     try:
         while True:
             num_transactions = random.randint(1, 20)  # Número aleatório de transações entre 1 e 20
-            for _ in range(num_transactions):
-                sender, recipient, amount = client.generate_random_transaction()
-                print('Enviando transação: Sender={}, Recipient={}, Amount={}'.format(sender, recipient, amount))
-                client.create_transaction(sender=sender, recipient=recipient, amount=amount)
+            if args.lote:
+                transactions = [client.generate_random_transaction() for _ in range(num_transactions)]
+                print('Enviando lote de {} transações'.format(num_transactions))
+                client.create_transactions(transactions)
+            else:
+                for _ in range(num_transactions):
+                    sender, recipient, amount = client.generate_random_transaction()
+                    print('Enviando transação: Sender={}, Recipient={}, Amount={}'.format(sender, recipient, amount))
+                    client.create_transaction(sender=sender, recipient=recipient, amount=amount)
             
             # Visualiza a cadeia de blocos após as transações (opcional)
             client.view_chain()
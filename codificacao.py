@@ -0,0 +1,204 @@
+"""
+Codificação binária compacta e determinística de blocos e transações.
+
+Formato (little-endian) de um bloco, versão 4:
+
+    versão        u8
+    index         u64
+    timestamp     f64 (só blocos com timestamp float são aceitos por encode_block)
+    proof         i64
+    previous_hash str
+    merkle_root   valor com tag (None em blocos sem raiz)
+    difficulty    valor com tag (None em blocos sem dificuldade registrada)
+    transações    u32 com a quantidade, seguido de sender, recipient, amount e fee
+
+Strings são u32 com o tamanho seguido dos bytes UTF-8. sender, recipient e
+amount (e fee) são valores com tag (um byte com o tipo seguido do conteúdo), pois o
+JSON aceito por /transactions/new não restringe seus tipos.
+
+Uma cadeia é MAGIC, u32 com a quantidade de blocos e cada bloco precedido do
+seu tamanho em u32. O hash dos blocos continua sendo calculado sobre o JSON;
+este formato serve apenas para transporte e armazenamento.
+
+As versões anteriores continuam sendo decodificadas: a 3 não tinha
+difficulty, a 2 também não tinha merkle_root e a 1 também não tinha fee
+(decodificado como 0).
+"""
+import json
+import struct
+
+from blocos import Block, Transaction
+
+CONTENT_TYPE = 'application/x-blockchain'
+MAGIC = b'BLKC'
+VERSION = 4
+
+_U8 = struct.Struct('<B')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_BLOCK_HEADER = struct.Struct('<BQdq')
+_STR_HEADER = struct.Struct('<BI')
+_INT_VALUE = struct.Struct('<Bq')
+_FLOAT_VALUE = struct.Struct('<Bd')
+
+_TAG_NONE = 0
+_TAG_FALSE = 1
+_TAG_TRUE = 2
+_TAG_INT = 3
+_TAG_FLOAT = 4
+_TAG_STR = 5
+_TAG_JSON = 6  # Qualquer outro valor (listas, dicts, inteiros fora de 64 bits)
+
+
+class DecodeError(ValueError):
+    """ Dados binários truncados ou em formato desconhecido """
+
+
+def _encode_str(parts, text):
+    data = text.encode()
+    parts.append(_U32.pack(len(data)))
+    parts.append(data)
+
+
+def _encode_value(parts, value):
+    kind = type(value)
+    if kind is str:
+        data = value.encode()
+        parts.append(_STR_HEADER.pack(_TAG_STR, len(data)))
+        parts.append(data)
+    elif kind is int and -2 ** 63 <= value < 2 ** 63:
+        parts.append(_INT_VALUE.pack(_TAG_INT, value))
+    elif kind is float:
+        parts.append(_FLOAT_VALUE.pack(_TAG_FLOAT, value))
+    elif value is None:
+        parts.append(_U8.pack(_TAG_NONE))
+    elif value is True or value is False:
+        parts.append(_U8.pack(_TAG_TRUE if value else _TAG_FALSE))
+    else:
+        parts.append(_U8.pack(_TAG_JSON))
+        _encode_str(parts, json.dumps(value, sort_keys=True))
+
+
+def _encode_block(parts, block):
+    if type(block.timestamp) is not float:
+        # Gravado como f64, um int voltaria como float e mudaria o hash do bloco
+        raise ValueError('timestamp do bloco deve ser float, não {}'.format(type(block.timestamp).__name__))
+    parts.append(_BLOCK_HEADER.pack(VERSION, block.index, block.timestamp, block.proof))
+    _encode_str(parts, block.previous_hash)
+    _encode_value(parts, block.merkle_root)
+    _encode_value(parts, block.difficulty)
+    transactions = block.transactions
+    parts.append(_U32.pack(len(transactions)))
+    for transaction in transactions:
+        _encode_value(parts, transaction.sender)
+        _encode_value(parts, transaction.recipient)
+        _encode_value(parts, transaction.amount)
+        _encode_value(parts, transaction.fee)
+
+
+def encode_block(block):
+    """ Codifica um Block em bytes """
+    parts = []
+    _encode_block(parts, block)
+    return b''.join(parts)
+
+
+def encode_chain(chain):
+    """ Codifica uma lista de blocos em um único documento binário """
+    return b''.join(iter_encode_chain(chain, len(chain)))
+
+
+def iter_encode_chain(blocks, count):
+    """ Produz o documento de encode_chain em partes, um bloco por vez """
+    yield MAGIC + _U32.pack(count)
+    for block in blocks:
+        data = encode_block(block)
+        yield _U32.pack(len(data)) + data
+
+
+class _Reader:
+    def __init__(self, data, offset=0):
+        self.data = memoryview(data)
+        self.offset = offset
+
+    def unpack(self, fmt):
+        try:
+            values = fmt.unpack_from(self.data, self.offset)
+        except struct.error:
+            raise DecodeError('Dados truncados na posição {}'.format(self.offset))
+        self.offset += fmt.size
+        return values
+
+    def read_str(self):
+        size = self.unpack(_U32)[0]
+        end = self.offset + size
+        if end > len(self.data):
+            raise DecodeError('Dados truncados na posição {}'.format(self.offset))
+        try:
+            text = str(self.data[self.offset:end], 'utf-8')
+        except UnicodeDecodeError:
+            raise DecodeError('String UTF-8 inválida na posição {}'.format(self.offset))
+        self.offset = end
+        return text
+
+    def read_value(self):
+        tag = self.unpack(_U8)[0]
+        if tag == _TAG_STR:  # Tipos mais comuns primeiro
+            return self.read_str()
+        if tag == _TAG_INT:
+            return self.unpack(_I64)[0]
+        if tag == _TAG_FLOAT:
+            return self.unpack(_F64)[0]
+        if tag == _TAG_NONE:
+            return None
+        if tag == _TAG_FALSE:
+            return False
+        if tag == _TAG_TRUE:
+            return True
+        if tag == _TAG_JSON:
+            return json.loads(self.read_str())
+        raise DecodeError('Tipo de valor desconhecido: {}'.format(tag))
+
+    def read_block(self):
+        version, index, timestamp, proof = self.unpack(_BLOCK_HEADER)
+        if not 1 <= version <= VERSION:
+            raise DecodeError('Versão de bloco não suportada: {}'.format(version))
+        previous_hash = self.read_str()
+        read_value = self.read_value
+        root = read_value() if version >= 3 else None
+        difficulty = read_value() if version >= 4 else None
+        if version >= 2:
+            transactions = [
+                Transaction(read_value(), read_value(), read_value(), read_value())
+                for _ in range(self.unpack(_U32)[0])
+            ]
+        else:
+            transactions = [
+                Transaction(read_value(), read_value(), read_value())
+                for _ in range(self.unpack(_U32)[0])
+            ]
+        return Block(index, timestamp, transactions, proof, previous_hash, root, difficulty)
+
+
+def decode_block(data):
+    """ Decodifica os bytes produzidos por encode_block """
+    reader = _Reader(data)
+    block = reader.read_block()
+    if reader.offset != len(reader.data):
+        raise DecodeError('Bytes sobrando após o bloco')
+    return block
+
+
+def decode_chain(data):
+    """ Decodifica os bytes produzidos por encode_chain """
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise DecodeError('Documento binário sem o cabeçalho esperado')
+    reader = _Reader(data, len(MAGIC))
+    chain = []
+    for _ in range(reader.unpack(_U32)[0]):
+        end = reader.unpack(_U32)[0] + reader.offset
+        chain.append(reader.read_block())
+        if reader.offset != end:
+            raise DecodeError('Tamanho de bloco inconsistente na posição {}'.format(end))
+    return chain
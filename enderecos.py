@@ -0,0 +1,83 @@
+"""
+Índice de endereços: onde cada endereço aparece na cadeia e seu saldo.
+
+Para cada endereço (sender ou recipient em texto) o índice guarda a lista de
+posições (index do bloco, posição da transação no bloco), na ordem da
+cadeia, e os totais recebido e enviado. Só valores numéricos de amount
+entram nos totais; a taxa (fee) não é transferida para ninguém e não altera
+os saldos.
+
+Blocos entram pelo final com add_block e, em uma troca de cadeia, saem pelo
+final com remove_blocks, que desfaz exatamente o que add_block fez.
+"""
+
+
+def _is_amount(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class AddressIndex:
+    """ Posições das transações e saldos por endereço, atualizados bloco a bloco """
+
+    def __init__(self):
+        self.locations = {}  # Endereço -> [(index do bloco, posição da transação)]
+        self.received = {}
+        self.sent = {}
+        self.length = 0  # Quantidade de blocos (da gênese em diante) já indexados
+
+    def add_block(self, block):
+        for position, transaction in enumerate(block.transactions):
+            location = (block.index, position)
+            sender, recipient, amount = transaction.sender, transaction.recipient, transaction.amount
+            if isinstance(sender, str):
+                self.locations.setdefault(sender, []).append(location)
+                if _is_amount(amount):
+                    self.sent[sender] = self.sent.get(sender, 0) + amount
+            if isinstance(recipient, str):
+                if recipient != sender:
+                    self.locations.setdefault(recipient, []).append(location)
+                if _is_amount(amount):
+                    self.received[recipient] = self.received.get(recipient, 0) + amount
+        self.length += 1
+
+    def remove_blocks(self, blocks):
+        """ Desfaz add_block para os últimos blocos indexados (blocks em ordem crescente) """
+        for block in reversed(blocks):
+            for transaction in reversed(block.transactions):
+                sender, recipient, amount = transaction.sender, transaction.recipient, transaction.amount
+                # Os valores são desfeitos antes das posições: sem posições o endereço sai do índice
+                if isinstance(recipient, str):
+                    if _is_amount(amount):
+                        self.received[recipient] -= amount
+                    if recipient != sender:
+                        self._pop_location(recipient)
+                if isinstance(sender, str):
+                    if _is_amount(amount):
+                        self.sent[sender] -= amount
+                    self._pop_location(sender)
+            self.length -= 1
+
+    def _pop_location(self, address):
+        locations = self.locations[address]
+        locations.pop()
+        if not locations:
+            del self.locations[address]
+            self.received.pop(address, None)
+            self.sent.pop(address, None)
+
+    def balance(self, address):
+        """ {'received', 'sent', 'balance', 'transactions'} do endereço """
+        received = self.received.get(address, 0)
+        sent = self.sent.get(address, 0)
+        return {
+            'received': received,
+            'sent': sent,
+            'balance': received - sent,
+            'transactions': len(self.locations.get(address, ())),
+        }
+
+    def recent(self, address, limit=None):
+        """ Posições das transações do endereço, da mais recente para a mais antiga """
+        locations = self.locations.get(address, [])
+        count = len(locations) if limit is None else min(max(limit, 0), len(locations))
+        return [locations[-1 - offset] for offset in range(count)]
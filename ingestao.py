@@ -0,0 +1,179 @@
+"""
+Fila de ingestão de métricas dos mineradores.
+
+Em vez de um INSERT e um commit por requisição, submit() só coloca a linha
+em uma fila limitada e retorna; uma thread retira as linhas em lotes de até
+batch_size (ou o que tiver chegado em flush_interval segundos) e grava cada
+lote com um único executemany em uma transação. Se a fila estiver cheia,
+submit() levanta IngestionFull e o handler responde 503 com Retry-After.
+
+As conexões vêm de um ConnectionPool criado a partir de uma função de
+conexão qualquer (pymysql.connect, sqlite3.connect, ...). O marcador de
+parâmetro do INSERT segue o paramstyle do driver, o que permite usar SQLite
+no lugar do MySQL. Só a thread de gravação usa o pool, então as conexões são
+abertas e usadas na mesma thread (o sqlite3 recusa conexões de outra thread).
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+_PLACEHOLDERS = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+_STOP = object()  # Colocado na fila por close() para acordar e encerrar a thread de gravação
+
+
+class IngestionFull(Exception):
+    """ A fila de ingestão atingiu o limite; a linha não foi aceita """
+
+
+def insert_statement(table, columns, paramstyle='format'):
+    """ INSERT com um marcador por coluna no paramstyle do driver ('qmark', 'format' ou 'pyformat') """
+    if paramstyle not in _PLACEHOLDERS:
+        raise ValueError('paramstyle não suportado: {}'.format(paramstyle))
+    return 'INSERT INTO {} ({}) VALUES ({})'.format(
+        table, ', '.join(columns), ', '.join([_PLACEHOLDERS[paramstyle]] * len(columns)))
+
+
+class ConnectionPool:
+    """
+    Até size conexões abertas sob demanda por connect() e reaproveitadas.
+    Uma conexão devolvida pode ser emprestada depois a outra thread; com
+    sqlite3 em mais de uma thread, connect() deve passar check_same_thread=False.
+    """
+
+    def __init__(self, connect, size=2):
+        self.connect = connect
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """ Empresta uma conexão; em caso de erro ela é fechada em vez de voltar ao pool """
+        connection = self._acquire()
+        try:
+            yield connection
+        except Exception:
+            self._discard(connection)
+            raise
+        self.idle.put(connection)
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                try:
+                    return self.connect()
+                except Exception:
+                    self.opened -= 1
+                    raise
+        return self.idle.get()  # Todas em uso: espera uma ser devolvida
+
+    def _discard(self, connection):
+        with self.lock:
+            self.opened -= 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+
+class MetricsIngestor:
+    """ Grava em lotes, em segundo plano, as linhas recebidas por submit() """
+
+    def __init__(self, pool, statement, max_queue=10000, batch_size=500, flush_interval=1.0):
+        self.pool = pool
+        self.statement = statement
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows = queue.Queue(max_queue)
+        self.written = 0  # Linhas gravadas com sucesso
+        self.failed = 0  # Linhas perdidas em lotes que o banco recusou
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.writer = None
+
+    def submit(self, row):
+        """ Enfileira a linha (uma tupla na ordem das colunas) sem esperar o banco """
+        with self.lock:
+            if self.closed.is_set():
+                raise IngestionFull('Fila de ingestão encerrada')
+            try:
+                self.rows.put_nowait(row)
+            except queue.Full:
+                raise IngestionFull('Fila de ingestão cheia') from None
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+
+    def pending(self):
+        return self.rows.qsize()
+
+    def _next_batch(self):
+        """
+        Espera a primeira linha e junta as seguintes até batch_size ou
+        flush_interval. Retorna o lote e se close() pediu o encerramento.
+        """
+        row = self.rows.get()
+        if row is _STOP:
+            return [], True
+        batch = [row]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                row = self.rows.get(timeout=remaining) if remaining > 0 else self.rows.get_nowait()
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _write_loop(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        """ Grava o lote com um executemany e um commit; se falhar, desfaz a transação """
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.executemany(self.statement, batch)
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except Exception as e:
+            self.failed += len(batch)
+            print('Erro ao gravar {} métricas no banco de dados: {}'.format(len(batch), e))
+        else:
+            self.written += len(batch)
+
+    def close(self):
+        """ Para de aceitar linhas e espera a gravação das que já estão na fila """
+        with self.lock:
+            self.closed.set()
+            writer = self.writer
+        if writer is not None:
+            self.rows.put(_STOP)  # Depois das linhas já enfileiradas; espera vaga se a fila estiver cheia
+            writer.join()
@@ -0,0 +1,148 @@
+"""
+Transações pendentes (mempool).
+
+As transações ficam em um dict indexado pelo hash, o que torna a recusa de
+duplicatas O(1), e em um índice por remetente. A ordem de prioridade é a
+maior taxa (fee) primeiro e, entre taxas iguais, a chegada mais antiga, que
+era a ordem da lista original.
+
+Dois heaps guardam essa ordem: um de máximo, de onde take(k) retira as k
+transações mais prioritárias em O(k log n) para montar um bloco, e um de
+mínimo, de onde sai a menos prioritária quando os limites de quantidade ou
+de bytes são atingidos. Remoções não mexem nos heaps; as entradas que não
+estão mais no dict são descartadas quando chegam ao topo (remoção
+preguiçosa) e os heaps são reconstruídos se o lixo passar do dobro do
+tamanho da mempool.
+"""
+import heapq
+import itertools
+import json
+
+
+class MempoolFull(Exception):
+    """ A transação não cabe na mempool e não tem prioridade para desalojar outra """
+
+
+def _sender_key(sender):
+    # Os campos da transação aceitam qualquer valor JSON; listas e dicts não servem de chave
+    return sender if isinstance(sender, (str, int, float)) or sender is None else json.dumps(sender, sort_keys=True)
+
+
+class Mempool:
+    """ Transações pendentes com índice por hash e por remetente, limites de tamanho e prioridade por taxa """
+
+    def __init__(self, max_transactions=100000, max_bytes=64 * 1024 * 1024, max_per_block=1000,
+                 max_per_sender=None):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.max_per_block = max_per_block  # Limite de transações em um bloco montado por take()
+        self.max_per_sender = max_per_sender
+        self.entries = {}  # Hash -> (transação, tamanho, sequência de chegada)
+        self.senders = {}  # Remetente -> {hash: None}, na ordem de chegada
+        self.size = 0  # Soma dos tamanhos das transações, em bytes
+        self.best_heap = []  # (-fee, sequência, hash): topo é a mais prioritária
+        self.worst_heap = []  # (fee, -sequência, hash): topo é a menos prioritária
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, transaction_hash):
+        return transaction_hash in self.entries
+
+    def get(self, transaction_hash):
+        entry = self.entries.get(transaction_hash)
+        return entry[0] if entry is not None else None
+
+    def transactions(self):
+        """ Todas as transações pendentes, na ordem de chegada """
+        return [entry[0] for entry in self.entries.values()]
+
+    def by_sender(self, sender):
+        """ Transações pendentes do remetente, na ordem de chegada """
+        return [self.entries[transaction_hash][0] for transaction_hash in self.senders.get(_sender_key(sender), ())]
+
+    def add(self, transaction, transaction_hash=None):
+        """
+        Adiciona a transação. Retorna False se ela já estiver pendente,
+        levanta ValueError se a taxa não for um número não negativo e
+        MempoolFull se ela não couber nem desalojando transações de
+        prioridade menor.
+        """
+        fee = transaction.fee
+        if isinstance(fee, bool) or not isinstance(fee, (int, float)) or not fee >= 0:
+            raise ValueError('Taxa inválida: {!r}'.format(fee))
+        transaction_hash = transaction_hash or transaction.hash()
+        if transaction_hash in self.entries:
+            return False
+        sender = _sender_key(transaction.sender)
+        sender_hashes = self.senders.get(sender, ())
+        if self.max_per_sender is not None and len(sender_hashes) >= self.max_per_sender:
+            raise MempoolFull('Limite de transações pendentes do remetente atingido')
+
+        size = transaction.size()
+        if size > self.max_bytes:
+            raise MempoolFull('Transação maior que a mempool')
+        sequence = next(self.sequence)
+        # Abre espaço retirando as menos prioritárias, desde que todas percam para a nova
+        victims = []
+        count, total = len(self.entries), self.size
+        while (count >= self.max_transactions or total + size > self.max_bytes) and self._live(self.worst_heap):
+            if self.worst_heap[0][:2] >= (transaction.fee, -sequence):
+                break
+            victim = heapq.heappop(self.worst_heap)
+            victims.append(victim)
+            count -= 1
+            total -= self.entries[victim[2]][1]
+        if count >= self.max_transactions or total + size > self.max_bytes:
+            for victim in victims:  # Nada é desalojado se a nova transação não couber mesmo assim
+                heapq.heappush(self.worst_heap, victim)
+            raise MempoolFull('Mempool cheia')
+
+        self.remove(victim[2] for victim in victims)
+        self.entries[transaction_hash] = (transaction, size, sequence)
+        self.senders.setdefault(sender, {})[transaction_hash] = None
+        self.size += size
+        heapq.heappush(self.best_heap, (-transaction.fee, sequence, transaction_hash))
+        heapq.heappush(self.worst_heap, (transaction.fee, -sequence, transaction_hash))
+        return True
+
+    def _live(self, heap):
+        """ Descarta do topo do heap as entradas já removidas e devolve o heap """
+        while heap and heap[0][2] not in self.entries:
+            heapq.heappop(heap)
+        return heap
+
+    def remove(self, transaction_hashes):
+        """ Remove as transações com os hashes informados (as ausentes são ignoradas) """
+        for transaction_hash in transaction_hashes:
+            entry = self.entries.pop(transaction_hash, None)
+            if entry is None:
+                continue
+            transaction, size = entry[:2]
+            self.size -= size
+            sender = _sender_key(transaction.sender)
+            sender_hashes = self.senders[sender]
+            del sender_hashes[transaction_hash]
+            if not sender_hashes:
+                del self.senders[sender]
+        if len(self.best_heap) > 2 * len(self.entries) + 1024:
+            self._rebuild()
+
+    def take(self, k=None):
+        """ Retira e devolve as k transações mais prioritárias (k padrão: max_per_block) """
+        k = self.max_per_block if k is None else k
+        taken = []
+        while len(taken) < k and self._live(self.best_heap):
+            transaction_hash = heapq.heappop(self.best_heap)[2]
+            taken.append(self.entries[transaction_hash][0])
+            self.remove([transaction_hash])
+        return taken
+
+    def _rebuild(self):
+        self.best_heap = [(-transaction.fee, sequence, transaction_hash)
+                          for transaction_hash, (transaction, _, sequence) in self.entries.items()]
+        self.worst_heap = [(transaction.fee, -sequence, transaction_hash)
+                           for transaction_hash, (transaction, _, sequence) in self.entries.items()]
+        heapq.heapify(self.best_heap)
+        heapq.heapify(self.worst_heap)
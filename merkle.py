@@ -0,0 +1,68 @@
+"""
+Árvore de Merkle das transações de um bloco.
+
+As folhas são os hashes das transações (Transaction.hash). Cada nó interno
+é o SHA-256 de um byte 0x01 seguido dos dois filhos; o prefixo impede que
+um nó interno se passe por uma folha. Em um nível com quantidade ímpar de
+nós, o último sobe sem ser combinado (em vez de ser duplicado, o que
+permitiria duas listas de transações diferentes com a mesma raiz).
+
+Uma prova de inclusão é a lista de irmãos do caminho da folha até a raiz,
+cada um com o lado em que fica: O(log n) hashes em vez do bloco inteiro.
+"""
+import hashlib
+
+EMPTY_ROOT = hashlib.sha256(b'').hexdigest()  # Raiz de um bloco sem transações
+
+
+def _combine(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def _next_level(level):
+    paired = [_combine(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        paired.append(level[-1])
+    return paired
+
+
+def merkle_root(leaf_hashes):
+    """ Raiz (hex) da árvore sobre os hashes hex das folhas, na ordem das transações """
+    if not leaf_hashes:
+        return EMPTY_ROOT
+    level = [bytes.fromhex(leaf) for leaf in leaf_hashes]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0].hex()
+
+
+def merkle_proof(leaf_hashes, position):
+    """ Prova de inclusão da folha em position: [{'hash': irmão em hex, 'side': 'left'|'right'}] """
+    if not 0 <= position < len(leaf_hashes):
+        raise IndexError('Transação fora do bloco: {}'.format(position))
+    level = [bytes.fromhex(leaf) for leaf in leaf_hashes]
+    proof = []
+    while len(level) > 1:
+        sibling = position ^ 1
+        if sibling < len(level):  # Sem irmão o nó sobe sozinho e não entra na prova
+            proof.append({'hash': level[sibling].hex(), 'side': 'left' if sibling < position else 'right'})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(leaf_hash, proof, root):
+    """ Confere se a folha leaf_hash pertence à árvore com a raiz root """
+    try:
+        node = bytes.fromhex(leaf_hash)
+        for step in proof:
+            sibling = bytes.fromhex(step['hash'])
+            if step['side'] == 'left':
+                node = _combine(sibling, node)
+            elif step['side'] == 'right':
+                node = _combine(node, sibling)
+            else:
+                return False
+    except (KeyError, TypeError, ValueError):
+        return False
+    return node.hex() == root
@@ -0,0 +1,226 @@
+import functools
+import hashlib
+import multiprocessing
+import os
+
+# Dificuldade D: a prova é válida se o hash, como inteiro de 256 bits, for no
+# máximo (2 ** 256 - 1) // D, o que leva em média D tentativas. A padrão,
+# 2 ** 16, é exatamente a regra antiga: os quatro primeiros dígitos hex ("0000") zerados.
+DEFAULT_DIFFICULTY = 1 << 16
+MAX_PROOF = 1 << 63  # A prova é gravada como i64 no formato binário (codificacao)
+_DIGITS = tuple(enumerate(str(digit).encode() for digit in range(10)))
+
+
+@functools.lru_cache(maxsize=64)
+def proof_target(difficulty=DEFAULT_DIFFICULTY):
+    """ Alvo da dificuldade em 32 bytes big-endian, comparável direto com o digest """
+    return ((2 ** 256 - 1) // max(int(difficulty), 1)).to_bytes(32, 'big')
+
+
+PROOF_TARGET = proof_target()
+
+
+def valid_proof(last_proof, proof, difficulty=DEFAULT_DIFFICULTY):
+    """
+    Verifica se o hash de last_proof concatenado com proof está dentro do
+    alvo da dificuldade. Provas fora de 0 <= proof < MAX_PROOF nunca são
+    válidas, pois não caberiam no formato binário dos blocos.
+    """
+    if not isinstance(proof, int) or not 0 <= proof < MAX_PROOF:
+        return False
+    guess = '{}{}'.format(last_proof, proof).encode()
+    return hashlib.sha256(guess).digest() <= proof_target(difficulty)
+
+
+def search_range(last_proof, start, end, difficulty=DEFAULT_DIFFICULTY):
+    """
+    Procura a menor prova válida no intervalo [start, end) ou retorna None.
+
+    Equivalente a chamar valid_proof para cada nonce, mas o prefixo constante
+    (last_proof) é hasheado uma única vez e cada dezena de nonces reaproveita
+    uma cópia desse estado com as dezenas já escritas, de modo que por nonce
+    só é feito um copy(), um update() de um byte e a comparação do digest
+    bruto com o alvo.
+    """
+    base = hashlib.sha256(str(last_proof).encode())
+    target = proof_target(difficulty)
+    proof = max(start, 0)
+    end = min(end, MAX_PROOF)  # Como em valid_proof, nada fora de [0, MAX_PROOF)
+
+    # Nonces avulsos até alinhar em uma dezena
+    while proof < end and proof % 10:
+        if valid_proof(last_proof, proof, difficulty):
+            return proof
+        proof += 1
+
+    while proof + 10 <= end:
+        tens = proof // 10
+        prefix = base.copy()
+        if tens:  # Para os nonces 0..9 não há dígitos de dezena
+            prefix.update(b'%d' % tens)
+        for units, digit in _DIGITS:
+            guess = prefix.copy()
+            guess.update(digit)
+            if guess.digest() <= target:
+                return proof + units
+        proof += 10
+
+    while proof < end:
+        if valid_proof(last_proof, proof, difficulty):
+            return proof
+        proof += 1
+    return None
+
+
+class DifficultyRetarget:
+    """
+    Regra de ajuste da dificuldade, parte do consenso (todos os nós precisam
+    usar os mesmos parâmetros).
+
+    A gênese tem a dificuldade initial. A cada window blocos, a dificuldade
+    do bloco seguinte é a anterior multiplicada pela razão entre o tempo
+    esperado (block_time por intervalo) e o tempo observado entre o
+    primeiro e o último bloco da janela, limitada a max_factor para cima ou
+    para baixo. Entre ajustes ela se repete. Um bloco antigo, sem
+    dificuldade registrada, vale como initial e não é seguido de ajuste.
+
+    Como o ajuste confia nos timestamps, valid_timestamp também faz parte da
+    regra: o timestamp de um bloco não pode ser menor que o do anterior nem
+    passar de max_future segundos à frente do relógio de quem valida. Assim
+    só se reduz a dificuldade com o tempo passando de verdade.
+    """
+
+    def __init__(self, initial=DEFAULT_DIFFICULTY, window=10, block_time=30.0, max_factor=4, max_future=120.0):
+        self.initial = initial
+        self.window = window
+        self.block_time = block_time
+        self.max_factor = max_factor
+        self.max_future = max_future
+
+    def valid_timestamp(self, timestamp, parent_timestamp, now):
+        """ Confere o timestamp de um bloco contra o do anterior (None na gênese) e o relógio local """
+        if type(timestamp) is not float:  # Como o codec grava f64, um int mudaria o hash ao ser relido
+            return False
+        if parent_timestamp is not None and timestamp < parent_timestamp:
+            return False
+        return timestamp <= now + self.max_future
+
+    def expected(self, index, block_at):
+        """ Dificuldade exigida do bloco index; block_at(i) devolve o bloco de index i da mesma cadeia """
+        if index <= 1:
+            return self.initial
+        parent = block_at(index - 1)
+        if parent.difficulty is None:
+            return self.initial
+        if (index - 1) % self.window or index - 1 < self.window:
+            return parent.difficulty
+        first = block_at(index - self.window)
+        observed = max(parent.timestamp - first.timestamp, 1e-3)
+        ratio = self.block_time * (self.window - 1) / observed
+        ratio = min(max(ratio, 1 / self.max_factor), self.max_factor)
+        return max(int(parent.difficulty * ratio), 1)
+
+
+class SerialProofOfWork:
+    """ Motor de prova de trabalho que percorre os nonces em um único processo """
+
+    def __init__(self, chunk_size=20000):
+        self.chunk_size = chunk_size
+        self.hashes = 0  # Nonces testados desde a criação do motor
+
+    def search(self, last_proof, difficulty=DEFAULT_DIFFICULTY, start=0, should_stop=None):
+        """
+        Menor prova válida a partir do nonce start. should_stop(), se
+        informado, é consultado entre blocos de nonces; se retornar True a
+        busca é abandonada e o resultado é None.
+        """
+        while True:
+            proof = search_range(last_proof, start, start + self.chunk_size, difficulty)
+            if proof is not None:
+                self.hashes += proof - start + 1
+                return proof
+            self.hashes += self.chunk_size
+            start += self.chunk_size
+            if should_stop is not None and should_stop():
+                return None
+
+
+class ParallelProofOfWork:
+    """
+    Motor de prova de trabalho que divide o espaço de nonces entre processos.
+
+    O espaço é cortado em blocos de chunk_size nonces e o trabalhador i fica
+    com os blocos i, i + workers, i + 2 * workers, ... Quando alguém encontra
+    uma prova, os trabalhadores cujo próximo bloco começa depois dela param;
+    os que ainda cobrem nonces menores terminam o bloco atual. Assim o
+    resultado é sempre a menor prova válida, a mesma do SerialProofOfWork.
+
+    Os trabalhadores somam os nonces testados em um contador compartilhado,
+    lido em hashes, para medir a taxa agregada de todos os processos.
+    """
+
+    def __init__(self, workers=None, chunk_size=20000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.serial = SerialProofOfWork(chunk_size)  # Usado quando há um único trabalhador
+        self.counter = multiprocessing.get_context().Value('q', 0)
+
+    @property
+    def hashes(self):
+        """ Nonces testados por todos os trabalhadores desde a criação do motor """
+        return self.counter.value + self.serial.hashes
+
+    def search(self, last_proof, difficulty=DEFAULT_DIFFICULTY, start=0, should_stop=None):
+        """
+        Mesmo contrato de SerialProofOfWork.search. Levanta RuntimeError se
+        todos os trabalhadores terminarem sem prova (por exemplo, se caírem).
+        """
+        if self.workers == 1:
+            return self.serial.search(last_proof, difficulty, start, should_stop)
+
+        context = multiprocessing.get_context()
+        best = context.Value('q', -1)  # -1 indica que nenhuma prova foi encontrada
+        processes = [
+            context.Process(
+                target=_search_strided,
+                args=(last_proof, difficulty, start, offset, self.workers, self.chunk_size, best, self.counter),
+                daemon=True,
+            )
+            for offset in range(self.workers)
+        ]
+        try:
+            for process in processes:
+                process.start()
+            for process in processes:
+                while process.is_alive():
+                    process.join(0.2)
+                    if should_stop is not None and best.value == -1 and should_stop():
+                        return None
+        finally:
+            # Garante que nenhum trabalhador continue minerando se a busca for interrompida
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        if best.value == -1:
+            raise RuntimeError('Os trabalhadores terminaram sem encontrar a prova (códigos de saída: {})'.format(
+                [process.exitcode for process in processes]))
+        return best.value
+
+
+def _search_strided(last_proof, difficulty, first, offset, stride, chunk_size, best, counter):
+    """ Laço executado por cada trabalhador do ParallelProofOfWork """
+    chunk = offset
+    while True:
+        start = first + chunk * chunk_size
+        found = best.value
+        if found != -1 and found < start:
+            return
+        proof = search_range(last_proof, start, start + chunk_size, difficulty)
+        with counter.get_lock():
+            counter.value += chunk_size if proof is None else proof - start + 1
+        if proof is not None:
+            with best.get_lock():
+                if best.value == -1 or proof < best.value:
+                    best.value = proof
+            return
+        chunk += stride
@@ -1,27 +1,44 @@
+import argparse
 import requests
 import random
 import string
+import threading
 import time
 import hashlib
 import psutil  # Para monitorar o uso da CPU
 
+from cabecalhos import HeaderCache, HeaderError
+from mineracao import ParallelProofOfWork
+
 class MiningClient:
     
     BASE_URL = 'http://192.168.100.215:8000'
+    CHUNK_SIZE = 100000  # Nonces por bloco de busca de cada processo
+    TIP_CHECK_INTERVAL = 5  # Segundos entre consultas ao topo durante a busca
+    TELEMETRY_INTERVAL = 30  # Segundos entre envios de métricas
 
-    def __init__(self):
+    def __init__(self, workers=None):
         self.repeated_transmissions_count = 0  # atributo para contagem de transmissões repetidas
         self.miner_address = self.generate_random_miner_address()
         self.miner_name = 'Miner_' + self.miner_address
         self.blocks_mined = 0
         self.errors_count = 0
-        self.total_hashes = 0
         self.successful_mining_attempts = 0
         self.start_time = time.time()
         self.hash_rate = 0.0
         self.retransmissions_count = 0  # Adiciona o contador de transmissões repetidas
         self.inicio_time = time.time()  # Tempo de início do minerador
-        
+        self.headers = HeaderCache(self.BASE_URL)  # Só os cabeçalhos da cadeia, baixados incrementalmente
+        # Um processo de busca por núcleo (ou workers), cada um com sua faixa de nonces
+        self.engine = ParallelProofOfWork(workers, self.CHUNK_SIZE)
+        self.telemetry_stop = threading.Event()
+        self.telemetry_thread = None
+
+    @property
+    def total_hashes(self):
+        """ Nonces testados por todos os processos de busca """
+        return self.engine.hashes
+
     def get_uptime(self):
         """ Calcula o tempo de disponibilidade (uptime) do minerador """
         return time.time() - self.inicio_time    
@@ -38,68 +55,88 @@ class MiningClient:
 
     def mine_block(self):
         """ Minerar um novo bloco na blockchain """
-        url = '{}/mine'.format(self.BASE_URL)
-        headers = {'Miner-Address': self.miner_address}
+        url = '{}/mine/submit'.format(self.BASE_URL)
 
         while True:
             try:
-                response = requests.get('{}/chain'.format(self.BASE_URL))
-                if response.status_code == 200:
-                    data = response.json()
-                    last_block = data['chain'][-1]
-                    last_proof = last_block['proof']
-                else:
-                    print('Erro ao obter a cadeia: {}'.format(response.text))
-                    return
+                self.headers.sync()
+                tip = self.headers.tip()
+            except HeaderError as e:
+                print('Erro ao obter a cadeia:', e)
+                return
             except requests.exceptions.RequestException as e:
                 print('Erro ao obter a cadeia:', e)
                 self.retransmissions_count += 1  # Incrementa o contador de transmissões repetidas 
                 return
 
-            difficulty = 5
-            hash_prefix = '0' * difficulty
-            nonce = 0
-
-            while True:
-                nonce += 1
-                hash_result = self.calculate_hash('{}{}{}'.format(last_proof, nonce, time.time()))
-                self.total_hashes += 1
-
-                if hash_result.startswith(hash_prefix):
-                    end_time = time.time()
-                    time_elapsed = end_time - self.start_time
-
-                    print('Novo bloco minerado!')
-                    print('Hash: {}'.format(hash_result))
-                    print('Nonce: {}'.format(nonce))
+            proof = self.search_proof(tip)
+            if proof is not None:
+                print('Novo bloco minerado!')
+                print('Prova: {}'.format(proof))
+                # O nó confere a prova com um único hash em vez de minerar o bloco de novo
+                response = requests.post(url, json={
+                    'proof': proof,
+                    'previous_hash': tip['hash'],
+                    'miner_address': self.miner_address
+                })
+                if response.status_code == 201:
+                    print('Bloco minerado com sucesso!')
                     self.blocks_mined += 1
                     self.successful_mining_attempts += 1  # Atualiza tentativas de mineração bem-sucedidas
-
-                    response = requests.get(url, headers=headers)
-                    if response.status_code == 200:
-                        print('Bloco minerado com sucesso!')
-                    else:
-                        print('Erro ao minerar bloco: {}'.format(response.text))
-                        self.errors_count += 1
-                    break
-
-                if self.total_hashes % 1000 == 0:
-                    time_elapsed = time.time() - self.start_time
-                    if time_elapsed > 0:
-                        self.hash_rate = self.total_hashes / time_elapsed
-
-            time_elapsed = time.time() - self.start_time
-            if time_elapsed > 0:
-                self.hash_rate = self.total_hashes / time_elapsed
-
-            self.hash_rate /= 1000000000  # Converte para GH/s
-
-            # Atualiza a taxa de sucesso
-            self.update_success_rate()
+                else:
+                    print('Erro ao minerar bloco: {}'.format(response.text))
+                    self.errors_count += 1
 
             # Espera antes de tentar minerar novamente
             time.sleep(30)
 
+    def search_proof(self, tip):
+        """
+        Procura uma prova sobre o topo tip com o mesmo hash que o nó confere
+        (mineracao.valid_proof), na dificuldade exigida do próximo bloco,
+        com todos os processos de busca. Retorna None se o topo mudar
+        durante a busca.
+        """
+        last_check = [time.time()]
+
+        def tip_changed():
+            if time.time() - last_check[0] < self.TIP_CHECK_INTERVAL:
+                return False
+            last_check[0] = time.time()
+            try:
+                self.headers.sync()
+            except (requests.exceptions.RequestException, HeaderError):
+                return False  # Sem resposta do nó, continua sobre o topo conhecido
+            if self.headers.tip()['hash'] != tip['hash']:
+                print('Novo bloco na cadeia; recomeçando a busca')
+                return True
+            return False
+
+        start = random.randrange(2 ** 32)  # Mineradores diferentes começam em pontos diferentes
+        return self.engine.search(tip['proof'], self.headers.next_difficulty, start, tip_changed)
+
+    def start_telemetry(self, interval=None):
+        """ Inicia a thread que coleta e envia as métricas sem interromper a mineração """
+        interval = self.TELEMETRY_INTERVAL if interval is None else interval
+        self.get_cpu_usage()  # A primeira leitura sem intervalo só marca o início da medição
+        self.telemetry_thread = threading.Thread(target=self._telemetry_loop, args=(interval,), daemon=True)
+        self.telemetry_thread.start()
+
+    def stop_telemetry(self):
+        self.telemetry_stop.set()
+        if self.telemetry_thread is not None:
+            self.telemetry_thread.join()
+            self.telemetry_thread = None
+
+    def _telemetry_loop(self, interval):
+        last_hashes, last_time = self.total_hashes, time.time()
+        while not self.telemetry_stop.wait(interval):
+            hashes, now = self.total_hashes, time.time()
+            # Taxa agregada de todos os processos no último intervalo, em GH/s
+            self.hash_rate = (hashes - last_hashes) / (now - last_time) / 1000000000
+            last_hashes, last_time = hashes, now
+            self.update_success_rate()
+
     def update_success_rate(self):
         """ Atualiza a taxa de sucesso de mineração e envia para o servidor """
         total_attempts = self.blocks_mined + self.errors_count
@@ -127,7 +164,7 @@ class MiningClient:
 
         try:
             response = requests.post(url, json=metrics)
-            if response.status_code == 201:
+            if response.status_code in (201, 202):  # 202: aceitas para gravação em lote
                 print('Métricas do minerador salvas com sucesso!')
                 self.retransmissions_count = 0  # Zera o contador de transmissões repetidas após envio bem-sucedido                
             else:
@@ -140,7 +177,7 @@ class MiningClient:
         url = '{}/ping'.format(self.BASE_URL)
         try:
             start_time = time.time()
-            response = requests.get(url, timeout=60)
+            response = requests.get(url, timeout=5)
             end_time = time.time()
             rtt = (end_time - start_time) * 1000
             if response.status_code == 200:
@@ -152,32 +189,22 @@ class MiningClient:
             print('Erro ao calcular o tempo de retransmissão:', e)
             return 0
 
-    def resolve_conflicts(self):
-        """ Solicita resolução de conflitos para sincronizar com a cadeia mais longa """
-        url = '{}/nodes/resolve'.format(self.BASE_URL)
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            print(data['message'])
-            self.update_success_rate()  # Atualiza as métricas após resolver conflitos
-        else:
-            print('Erro ao resolver conflitos: {}'.format(response.text))
-
     def run(self):
-        """ Inicia o processo de mineração e resolução de conflitos """
+        """ Inicia o processo de mineração (os nós propagam os blocos novos entre si) """
+        self.start_telemetry()
         try:
             while True:
                 print('Tentando minerar um novo bloco...')
                 self.mine_block()
-                self.resolve_conflicts()
         finally:
             print('Concluído')
+            self.stop_telemetry()
             # Salva as métricas finais quando o loop é finalizado
             self.update_success_rate()
 
     def get_cpu_usage(self):
-        """ Obtém a utilização atual da CPU em porcentagem """
-        return psutil.cpu_percent(interval=1)
+        """ Obtém a utilização média da CPU, em porcentagem, desde a leitura anterior """
+        return psutil.cpu_percent(interval=None)
     
     def get_cpu_frequency(self):
         """Obtém a frequência máxima da CPU em GHz."""
@@ -188,5 +215,9 @@ class MiningClient:
     
 
 if __name__ == '__main__':
-    client = MiningClient()
+    parser = argparse.ArgumentParser(description='Minerador da blockchain')
+    parser.add_argument('--processos', type=int, default=None,
+                        help='Processos de busca de prova (padrão: um por núcleo)')
+    args = parser.parse_args()
+    client = MiningClient(args.processos)
     client.run()
@@ -0,0 +1,296 @@
+""" Comunicação com os nós vizinhos """
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+
+class PeerClient:
+    """
+    Cliente HTTP compartilhado para os vizinhos.
+
+    Cada vizinho tem sua própria requests.Session, reaproveitada entre
+    chamadas para manter a conexão keep-alive. Toda requisição tem timeout e
+    map() consulta vários vizinhos em paralelo com um prazo total.
+    """
+
+    def __init__(self, timeout=(3.05, 10), max_workers=16):
+        self.timeout = timeout  # (conexão, leitura) em segundos, por requisição
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='vizinhos')
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def session(self, peer):
+        with self.lock:
+            session = self.sessions.get(peer)
+            if session is None:
+                session = self.sessions[peer] = requests.Session()
+            return session
+
+    def get(self, peer, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session(peer).get(peer + path, **kwargs)
+
+    def post(self, peer, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session(peer).post(peer + path, **kwargs)
+
+    def map(self, function, peers, deadline):
+        """
+        Executa function(peer) para todos os vizinhos em paralelo e retorna
+        {peer: resultado} dos que terminaram sem erro em até deadline
+        segundos. Vizinhos que falharem ou atrasarem são ignorados; os
+        atrasados são encerrados pelos timeouts das próprias requisições.
+        """
+        futures = {self.executor.submit(function, peer): peer for peer in peers}
+        done, _ = wait(futures, timeout=deadline)
+        return {futures[future]: future.result() for future in done if future.exception() is None}
+
+
+class PeerTable:
+    """
+    Vizinhos conhecidos, com pontuação de saúde e o último topo visto.
+
+    A pontuação é uma média móvel exponencial dos sucessos (1) e falhas (0)
+    das consultas ao vizinho. best(n) devolve os n vizinhos mais saudáveis e
+    mais altos, limitando quantos são consultados a cada resolução de
+    conflitos. Um vizinho que falha max_failures vezes seguidas é removido,
+    exceto as sementes passadas na criação.
+    """
+
+    SMOOTHING = 0.2
+    MAX_PEERS = 1000
+
+    def __init__(self, client, seeds=(), own_url=None, max_failures=10):
+        self.client = client
+        self.own_url = own_url
+        self.seeds = set(seeds)
+        self.max_failures = max_failures
+        self.peers = {}
+        self.lock = threading.Lock()
+        self.prober = None
+        for url in seeds:
+            self.add(url)
+
+    def add(self, url):
+        """ Registra um vizinho; retorna False se já era conhecido ou foi recusado """
+        url = url.rstrip('/')
+        if not url.startswith(('http://', 'https://')) or url == self.own_url:
+            return False
+        with self.lock:
+            if url in self.peers or len(self.peers) >= self.MAX_PEERS:
+                return False
+            self.peers[url] = {
+                'url': url,
+                'score': 0.5,  # Neutro até a primeira consulta
+                'height': 0,
+                'hash': None,
+                'last_seen': None,
+                'failures': 0,
+            }
+            return True
+
+    def urls(self):
+        with self.lock:
+            return list(self.peers)
+
+    def known(self, url):
+        with self.lock:
+            return url.rstrip('/') in self.peers
+
+    def record_success(self, url, height=None, block_hash=None):
+        with self.lock:
+            peer = self.peers.get(url)
+            if peer is None:
+                return
+            peer['score'] += self.SMOOTHING * (1 - peer['score'])
+            peer['failures'] = 0
+            peer['last_seen'] = time.time()
+            if height is not None:
+                peer['height'] = height
+                peer['hash'] = block_hash
+
+    def record_failure(self, url):
+        with self.lock:
+            peer = self.peers.get(url)
+            if peer is None:
+                return
+            peer['score'] -= self.SMOOTHING * peer['score']
+            peer['failures'] += 1
+            if peer['failures'] >= self.max_failures and url not in self.seeds:
+                del self.peers[url]
+
+    def best(self, n):
+        """ Os n vizinhos com maior pontuação, desempatando pela maior altura """
+        with self.lock:
+            ranked = sorted(self.peers.values(), key=lambda peer: (peer['score'], peer['height']), reverse=True)
+            return [peer['url'] for peer in ranked[:n]]
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(peer) for peer in self.peers.values()]
+
+    def probe(self, deadline=10):
+        """ Consulta /chain/tip de todos os vizinhos em paralelo e atualiza a tabela """
+        urls = self.urls()
+        results = self.client.map(self._probe_one, urls, deadline)
+        for url in urls:
+            if url not in results:
+                self.record_failure(url)
+
+    def _probe_one(self, url):
+        response = self.client.get(url, '/chain/tip')
+        response.raise_for_status()
+        data = response.json()
+        self.record_success(url, data['length'], data['hash'])
+
+    def discover(self, sample=3):
+        """ Pergunta a alguns dos melhores vizinhos quais vizinhos eles conhecem """
+        def known_peers(url):
+            response = self.client.get(url, '/nodes')
+            response.raise_for_status()
+            return [peer['url'] for peer in response.json()['nodes']]
+
+        for urls in self.client.map(known_peers, self.best(sample), deadline=10).values():
+            for url in urls:
+                self.add(url)
+
+    def announce(self, seeds=None):
+        """ Registra o próprio endereço nos vizinhos para que eles também nos conheçam """
+        if not self.own_url:
+            return
+        def register(url):
+            self.client.post(url, '/nodes/register', json={'nodes': [self.own_url]}).raise_for_status()
+
+        self.client.map(register, list(seeds or self.seeds), deadline=10)
+
+    def start_probing(self, interval=30):
+        """ Sondagem periódica de liveness (e descoberta) em uma thread em segundo plano """
+        if self.prober is not None:
+            return
+        def loop():
+            self.announce()
+            while True:
+                self.probe()
+                self.discover()
+                time.sleep(interval)
+
+        self.prober = threading.Thread(target=loop, daemon=True)
+        self.prober.start()
+
+
+class TokenBucket:
+    """ Limitador de taxa: até burst itens de uma vez, repostos a rate itens por segundo """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, amount=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+
+class Gossip:
+    """
+    Propagação de blocos e transações por anúncio de inventário.
+
+    announce() enfileira o hash de um item novo; uma thread junta os anúncios
+    a cada flush_interval segundos e envia um único POST /inv para cada um
+    dos melhores vizinhos. Quem recebe chama receive(), que descarta hashes
+    já vistos ou já em busca e aplica um limite de taxa por vizinho; os itens
+    restantes são buscados no vizinho que os anunciou e, se aceitos,
+    anunciados de novo. Um hash só passa a contar como visto depois que o
+    item é aceito (fetched), de modo que uma busca que falhou não impede
+    buscar o item no próximo vizinho que o anunciar.
+    """
+
+    MAX_SEEN = 100000
+
+    def __init__(self, client, peer_table, own_url, fanout=8, flush_interval=0.2, rate=100, burst=500):
+        self.client = client
+        self.peer_table = peer_table
+        self.own_url = own_url
+        self.fanout = fanout
+        self.flush_interval = flush_interval
+        self.rate = rate
+        self.burst = burst
+        self.seen = OrderedDict()  # Hash -> vizinho de quem o item veio (None se local)
+        self.fetching = {}  # Hash -> vizinho em que o item está sendo buscado
+        self.buckets = {}
+        self.outbox = []
+        self.lock = threading.Lock()
+        self.sender = None
+
+    def _mark_seen(self, item_hash, origin):
+        """ Registra o hash; retorna False se ele já tinha sido visto """
+        if item_hash in self.seen:
+            self.seen.move_to_end(item_hash)
+            return False
+        self.seen[item_hash] = origin
+        while len(self.seen) > self.MAX_SEEN:
+            self.seen.popitem(last=False)
+        return True
+
+    def announce(self, kind, item_hash):
+        """ Enfileira o anúncio de um item (kind é 'block' ou 'tx') para os vizinhos """
+        with self.lock:
+            origin = self.seen[item_hash] if item_hash in self.seen else self.fetching.get(item_hash)
+            self._mark_seen(item_hash, origin)
+            self.outbox.append({'type': kind, 'hash': item_hash})
+            if self.sender is None:
+                self.sender = threading.Thread(target=self._send_loop, daemon=True)
+                self.sender.start()
+
+    def receive(self, origin, items):
+        """
+        Filtra um anúncio recebido: devolve os itens novos dentro do limite de
+        taxa do vizinho. Cada item devolvido deve ser encerrado com fetched().
+        """
+        accepted = []
+        with self.lock:
+            bucket = self.buckets.get(origin)
+            if bucket is None:
+                bucket = self.buckets[origin] = TokenBucket(self.rate, self.burst)
+            for item in items:
+                if item.get('type') not in ('block', 'tx') or not isinstance(item.get('hash'), str):
+                    continue
+                if item['hash'] in self.seen or item['hash'] in self.fetching:
+                    continue
+                if not bucket.take():
+                    break  # Excedeu a taxa: o restante do anúncio é descartado
+                self.fetching[item['hash']] = origin
+                accepted.append(item)
+        return accepted
+
+    def fetched(self, item_hash, accepted):
+        """ Encerra a busca de um item devolvido por receive(); só um item aceito conta como visto """
+        with self.lock:
+            origin = self.fetching.pop(item_hash, None)
+            if accepted:
+                self._mark_seen(item_hash, self.seen.get(item_hash, origin))
+
+    def _send_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self.lock:
+                items, self.outbox = self.outbox, []
+                origins = {item['hash']: self.seen.get(item['hash']) for item in items}
+            if not items:
+                continue
+            def send(peer):
+                # Não devolve a um vizinho os itens que vieram dele
+                batch = [item for item in items if origins[item['hash']] != peer]
+                if batch:
+                    self.client.post(peer, '/inv', json={'from': self.own_url, 'items': batch})
+
+            self.client.map(send, self.peer_table.best(self.fanout), deadline=10)
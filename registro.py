@@ -0,0 +1,158 @@
+"""
+Arquivos de registro só de acréscimo (recompensas, métricas da cadeia).
+
+write() apenas guarda o registro em memória; uma thread grava o que estiver
+acumulado a cada flush_interval segundos, ou antes disso quando o buffer
+chega a flush_size registros. Assim quem registra (por exemplo a requisição
+que minerou o bloco) não espera o disco.
+
+A política de fsync decide quando os dados chegam ao disco:
+
+    'none'    só flush para o sistema operacional (padrão)
+    'batch'   um fsync por lote gravado
+    'record'  um fsync por registro
+
+Formatos: 'text' (valores separados por separator, uma linha por registro),
+'csv' e 'binary' (cada registro é um u32 com o tamanho seguido do JSON,
+lido de volta por read_binary_records). O cabeçalho, se informado, só é
+escrito quando o arquivo está vazio.
+
+close() grava o que restar no buffer; os registros ainda abertos no fim do
+processo são gravados por um handler de atexit.
+"""
+import atexit
+import csv
+import io
+import json
+import os
+import struct
+import threading
+import weakref
+
+FSYNC_POLICIES = ('none', 'batch', 'record')
+FORMATS = ('text', 'csv', 'binary')
+
+_U32 = struct.Struct('<I')
+_open_writers = weakref.WeakSet()
+
+
+class AppendLogWriter:
+    """ Registro em arquivo com buffer em memória e gravação em segundo plano """
+
+    def __init__(self, path, header=None, format='text', separator=', ', flush_interval=1.0, flush_size=1000,
+                 fsync='none'):
+        if format not in FORMATS:
+            raise ValueError('Formato de registro desconhecido: {}'.format(format))
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError('Política de fsync desconhecida: {}'.format(fsync))
+        self.path = path
+        self.format = format
+        self.separator = separator
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+        self.file = open(path, 'ab') if format == 'binary' else open(path, 'a', newline='')
+        self.buffer = []
+        self.lock = threading.Lock()  # Protege buffer e closed
+        self.ready = threading.Condition(self.lock)
+        self.io_lock = threading.Lock()  # Mantém a ordem dos lotes no arquivo
+        self.closed = False
+        self.flusher = None
+        if header is not None and self.file.tell() == 0:
+            # No texto o cabeçalho lista as colunas separadas por vírgula, como nos arquivos originais
+            self._write_records([', '.join(header) if format == 'text' else header])
+        _open_writers.add(self)
+
+    def _encode(self, record):
+        if self.format == 'binary':
+            data = json.dumps(record).encode()
+            return _U32.pack(len(data)) + data
+        if self.format == 'csv':
+            line = io.StringIO()
+            csv.writer(line).writerow(record)
+            return line.getvalue()
+        if isinstance(record, str):
+            return record + '\n'
+        return self.separator.join(map(str, record)) + '\n'
+
+    def write(self, record):
+        """ Acrescenta um registro (uma sequência de valores ou, no texto, uma linha pronta) """
+        with self.lock:
+            if self.closed:
+                raise ValueError('Registro fechado: {}'.format(self.path))
+            self.buffer.append(record)
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+            if len(self.buffer) >= self.flush_size:
+                self.ready.notify()
+
+    def flush(self):
+        """ Grava imediatamente o que estiver no buffer """
+        with self.io_lock:
+            with self.lock:
+                records, self.buffer = self.buffer, []
+            if records:
+                self._write_records(records)
+
+    def _flush_loop(self):
+        while True:
+            with self.lock:
+                if not self.closed and len(self.buffer) < self.flush_size:
+                    self.ready.wait(self.flush_interval)
+                if self.closed:
+                    return  # close() grava o restante
+            try:
+                self.flush()
+            except OSError as e:
+                print('Erro ao gravar o registro {}: {}'.format(self.path, e))
+
+    def _write_records(self, records):
+        for record in records:
+            self.file.write(self._encode(record))
+            if self.fsync == 'record':
+                self._sync()
+        if self.fsync == 'batch':
+            self._sync()
+        elif self.fsync == 'none':
+            self.file.flush()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        """ Grava o restante do buffer e fecha o arquivo """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.ready.notify()
+            flusher = self.flusher
+        if flusher is not None:
+            flusher.join()
+        self.flush()
+        self.file.close()
+        _open_writers.discard(self)
+
+
+def read_binary_records(path):
+    """ Registros de um arquivo gravado no formato 'binary' """
+    records = []
+    with open(path, 'rb') as file:
+        data = file.read()
+    position = 0
+    while position + _U32.size <= len(data):
+        (size,) = _U32.unpack_from(data, position)
+        position += _U32.size
+        if position + size > len(data):
+            break  # Registro incompleto no final (gravação interrompida)
+        records.append(json.loads(data[position:position + size]))
+        position += size
+    return records
+
+
+@atexit.register
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
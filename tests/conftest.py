@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Os módulos ficam na raiz do repositório, sem pacote instalável
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def blockchain(tmp_path, monkeypatch):
+    from blockchain import Blockchain
+    from mineracao import SerialProofOfWork
+
+    monkeypatch.chdir(tmp_path)  # Os registros de recompensas e métricas são gravados no diretório atual
+    blockchain = Blockchain(pow_engine=SerialProofOfWork())
+    yield blockchain
+    blockchain.close()
@@ -0,0 +1,155 @@
+import os
+
+import pytest
+
+from armazenamento import ENTRY, FileChainStore
+from blocos import Block, Transaction
+
+
+def _blocks(count):
+    blocks, previous_hash = [], '1'
+    for index in range(1, count + 1):
+        block = Block.build(index, 1000.0 + index, [Transaction('a', 'b', index)], 100 + index, previous_hash)
+        previous_hash = block.hash()
+        blocks.append(block)
+    return blocks
+
+
+def _fill(store, blocks):
+    for position, block in enumerate(blocks):
+        store.append(block, block.hash(), position, float(position), 16 * (position + 1))
+
+
+class FailingFile:
+    """ Arquivo cujo write falha, como em um disco cheio """
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        raise OSError('disco cheio')
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def test_failed_append_is_undone(tmp_path):
+    blocks = _blocks(3)
+    store = FileChainStore(str(tmp_path))
+    _fill(store, blocks[:2])
+    index = store.index
+    store.index = FailingFile(index)  # O registro chega a blocks.dat, a entrada do índice não
+    other = Block.build(3, 2000.0, [], 1, blocks[1].hash())
+    with pytest.raises(OSError):
+        store.append(other, other.hash(), 2, 2.0, 48)
+    store.index = index
+    assert len(store) == 2
+
+    store.append(blocks[2], blocks[2].hash(), 2, 2.0, 48)
+    store.close()
+    store = FileChainStore(str(tmp_path))
+    assert [store.block(position) for position in range(len(store))] == blocks
+    assert store.totals(2) == (2, 2.0)
+    assert store.work(2) == 48
+    store.close()
+
+
+def test_reopen_keeps_blocks_hashes_and_totals(tmp_path):
+    blocks = _blocks(4)
+    store = FileChainStore(str(tmp_path))
+    _fill(store, blocks)
+    store.close()
+
+    store = FileChainStore(str(tmp_path))
+    assert len(store) == 4
+    assert [store.block(position) for position in range(4)] == blocks
+    assert [store.block_hash(position) for position in range(4)] == [block.hash() for block in blocks]
+    assert store.position(blocks[2].hash()) == 2
+    assert store.totals(3) == (3, 3.0)
+    assert store.work(3) == 64
+    store.close()
+
+
+def _reopen_after(tmp_path, damage):
+    """ Grava 3 blocos, aplica damage(caminho dos dados, caminho do índice) e reabre o store """
+    blocks = _blocks(3)
+    store = FileChainStore(str(tmp_path))
+    _fill(store, blocks)
+    store.close()
+    damage(str(tmp_path / FileChainStore.DATA_FILE), str(tmp_path / FileChainStore.INDEX_FILE))
+    return blocks, FileChainStore(str(tmp_path))
+
+
+def _chop(path, count):
+    with open(path, 'r+b') as file:
+        file.truncate(os.path.getsize(path) - count)
+
+
+def _flip_last_byte(path):
+    with open(path, 'r+b') as file:
+        file.seek(-1, os.SEEK_END)
+        byte = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([byte[0] ^ 0xff]))
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data, index: _chop(data, 5),  # Registro incompleto: a queda veio antes da entrada do índice chegar
+    lambda data, index: _chop(index, 3),  # Entrada do índice incompleta
+    lambda data, index: _flip_last_byte(data),  # Registro com crc32 que não confere
+], ids=['registro', 'entrada', 'crc'])
+def test_torn_last_record_is_dropped_on_reopen(tmp_path, damage):
+    blocks, store = _reopen_after(tmp_path, damage)
+    assert len(store) == 2
+    assert [store.block(position) for position in range(2)] == blocks[:2]
+    assert os.path.getsize(tmp_path / FileChainStore.INDEX_FILE) == 2 * ENTRY.size
+
+    # O append seguinte continua logo após o último registro íntegro
+    store.append(blocks[2], blocks[2].hash(), 2, 2.0, 48)
+    store.close()
+    store = FileChainStore(str(tmp_path))
+    assert [store.block(position) for position in range(len(store))] == blocks
+    store.close()
+
+
+def test_record_in_data_file_without_index_entry_is_discarded(tmp_path):
+    blocks = _blocks(2)
+    store = FileChainStore(str(tmp_path))
+    _fill(store, blocks)
+    data_size = store.data_end
+    store.close()
+    with open(tmp_path / FileChainStore.DATA_FILE, 'ab') as file:
+        file.write(b'\x00' * 40)  # Registro gravado sem que a entrada do índice chegasse ao disco
+
+    store = FileChainStore(str(tmp_path))
+    assert len(store) == 2
+    assert os.path.getsize(tmp_path / FileChainStore.DATA_FILE) == data_size
+    store.close()
+
+
+def test_truncate_drops_blocks_from_disk_cache_and_hash_lookup(tmp_path):
+    blocks = _blocks(4)
+    store = FileChainStore(str(tmp_path))
+    _fill(store, blocks)
+    assert store.position(blocks[3].hash()) == 3
+    store.truncate(2)
+    assert len(store) == 2
+    assert store.position(blocks[3].hash()) is None
+    with pytest.raises(IndexError):
+        store.block(2)
+    store.close()
+
+    store = FileChainStore(str(tmp_path))
+    assert [store.block(position) for position in range(len(store))] == blocks[:2]
+    store.close()
+
+
+def test_store_read_past_the_cache(tmp_path):
+    blocks = _blocks(5)
+    store = FileChainStore(str(tmp_path))
+    store.CACHE_SIZE = 2
+    _fill(store, blocks)
+    assert len(store.cache) == 2
+    assert [store.block(position) for position in range(5)] == blocks  # Relidos do disco
+    assert store.block(-1) == blocks[-1]
+    store.close()
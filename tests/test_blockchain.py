@@ -0,0 +1,211 @@
+import struct
+import threading
+import time
+
+import pytest
+import requests
+
+import benchmarks
+
+from armazenamento import FileChainStore
+from blockchain import Blockchain, ChainChanged, ConcurrentHTTPServer, MiningJobQueue, RequestHandler, configure
+from blocos import Block, Transaction
+from mineracao import DEFAULT_DIFFICULTY, DifficultyRetarget, SerialProofOfWork, search_range
+
+
+def _extend(count, previous_hash, first_index, timestamp, difficulty=None):
+    """ Blocos encadeados a partir de previous_hash (as provas não são conferidas por replace_suffix) """
+    blocks, hashes = [], []
+    for index in range(first_index, first_index + count):
+        block = Block.build(index, timestamp + index, [], index, previous_hash, difficulty)
+        previous_hash = block.hash()
+        blocks.append(block)
+        hashes.append(previous_hash)
+    return blocks, hashes
+
+
+def test_iter_blocks_reads_a_consistent_range(blockchain):
+    blockchain.replace_suffix(1, *_extend(3, blockchain.last_hash, 2, time.time()))
+    assert [block.index for block in blockchain.iter_blocks(0, 4)] == [1, 2, 3, 4]
+
+
+def test_iter_blocks_stops_when_chain_switches_fork(blockchain):
+    genesis_hash = blockchain.last_hash
+    blockchain.replace_suffix(1, *_extend(3, genesis_hash, 2, 1000.0))
+    blocks = blockchain.iter_blocks(0, 4)
+    assert [next(blocks).index, next(blocks).index] == [1, 2]
+
+    # Troca de cadeia a partir do bloco 2 no meio da leitura
+    assert blockchain.replace_suffix(1, *_extend(4, genesis_hash, 2, 2000.0))
+    with pytest.raises(ChainChanged):
+        next(blocks)
+
+
+def _mine(blockchain, previous, timestamps, difficulty):
+    """ Blocos com provas válidas na dificuldade informada, um por timestamp, continuando previous """
+    blocks = []
+    previous_hash = previous.hash()
+    for timestamp in timestamps:
+        proof = search_range(previous.proof, 0, 10 ** 6, difficulty)
+        block = Block.build(previous.index + 1, timestamp, [], proof, previous_hash, difficulty)
+        blocks.append(block)
+        previous, previous_hash = block, block.hash()
+    return blocks
+
+
+@pytest.fixture
+def easy_blockchain(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(pow_engine=SerialProofOfWork(), retarget=DifficultyRetarget(initial=8, window=1000))
+    yield blockchain
+    blockchain.close()
+
+
+def test_chain_with_more_work_wins_over_longer_chain(blockchain):
+    genesis_hash = blockchain.last_hash
+    assert blockchain.replace_suffix(1, *_extend(4, genesis_hash, 2, 1000.0, difficulty=16))
+    work = blockchain.total_work()
+
+    # Mais blocos, menos trabalho: recusada
+    assert blockchain.work_gain(1, _extend(6, genesis_hash, 2, 2000.0, difficulty=8)[0]) < 0
+    assert not blockchain.replace_suffix(1, *_extend(6, genesis_hash, 2, 2000.0, difficulty=8))
+    assert len(blockchain.chain) == 5
+
+    # Menos blocos, mais trabalho: aceita
+    assert blockchain.replace_suffix(1, *_extend(2, genesis_hash, 2, 3000.0, difficulty=100))
+    assert len(blockchain.chain) == 3
+    assert blockchain.total_work() == work - 4 * 16 + 2 * 100
+
+
+def test_validate_chain_rejects_bad_timestamps(easy_blockchain):
+    genesis = easy_blockchain.last_block
+    now = time.time()
+    valid = _mine(easy_blockchain, genesis, [now + 1, now + 2, now + 3], 8)
+    assert easy_blockchain.validate_chain(valid, genesis, genesis.hash()) is not None
+
+    backwards = _mine(easy_blockchain, genesis, [now + 2, now + 1, now + 3], 8)
+    assert easy_blockchain.validate_chain(backwards, genesis, genesis.hash()) is None
+
+    future = _mine(easy_blockchain, genesis, [now + 1, now + 2, now + 3600], 8)
+    assert easy_blockchain.validate_chain(future, genesis, genesis.hash()) is None
+
+
+def test_add_block_rejects_bad_timestamps(easy_blockchain):
+    genesis = easy_blockchain.last_block
+    assert not easy_blockchain.add_block(_mine(easy_blockchain, genesis, [genesis.timestamp - 1], 8)[0])
+    assert not easy_blockchain.add_block(_mine(easy_blockchain, genesis, [time.time() + 3600], 8)[0])
+    assert easy_blockchain.add_block(_mine(easy_blockchain, genesis, [time.time()], 8)[0])
+
+
+def test_failed_append_leaves_indexes_in_step_with_the_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(pow_engine=SerialProofOfWork(), store=FileChainStore(str(tmp_path / 'dados')))
+    try:
+        genesis_hash = blockchain.last_hash
+        blockchain.address_balance('a')  # Monta o índice de endereços para que ele acompanhe os appends
+        # index fora de u64: a codificação falha dentro de store.append
+        block = Block.build(2 ** 64, 1000.0, [Transaction('a', 'b', 1)], 1, genesis_hash)
+        with pytest.raises(struct.error):
+            blockchain._append_block(block)
+        assert len(blockchain.store) == blockchain.metrics.length == blockchain.addresses.length == 1
+        assert blockchain.total_work() == blockchain.last_block.effective_difficulty
+        assert blockchain.metrics.total_transactions == 0
+
+        blocks, hashes = _extend(1, genesis_hash, 2, 1000.0)
+        assert blockchain.replace_suffix(1, blocks, hashes)
+        assert len(blockchain.store) == blockchain.metrics.length == blockchain.addresses.length == 2
+    finally:
+        blockchain.close()
+
+
+def test_int_timestamps_are_rejected(easy_blockchain):
+    genesis = easy_blockchain.last_block
+    block = _mine(easy_blockchain, genesis, [int(time.time())], 8)[0]
+    assert easy_blockchain.validate_chain([block], genesis, genesis.hash()) is None
+    assert not easy_blockchain.add_block(block)
+
+
+def test_mining_job_keeps_proof_when_tip_is_evicted_from_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = FileChainStore(str(tmp_path / 'dados'))
+    store.CACHE_SIZE = 2
+    searches = []
+
+    class EvictingProofOfWork(SerialProofOfWork):
+        def search(self, last_proof, difficulty=DEFAULT_DIFFICULTY, start=0, should_stop=None):
+            searches.append(last_proof)
+            assert len(searches) == 1, 'A prova encontrada foi descartada e a busca recomeçou'
+            list(blockchain.chain)  # Uma leitura longa (ex.: GET /chain) tira o topo do cache
+            return super().search(last_proof, difficulty, start, should_stop)
+
+    blockchain = Blockchain(pow_engine=EvictingProofOfWork(), store=store,
+                            retarget=DifficultyRetarget(initial=8, window=1000))
+    try:
+        blockchain.replace_suffix(1, *_extend(3, blockchain.last_hash, 2, time.time() - 10, difficulty=8))
+        blockchain.new_transaction('a', 'b', 1)
+        result = MiningJobQueue(blockchain)._mine('minerador')
+        assert result['index'] == 5
+    finally:
+        blockchain.close()
+
+
+def test_total_work_after_reopening_does_not_decode_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    blockchain = Blockchain(pow_engine=SerialProofOfWork(), store=FileChainStore(str(tmp_path / 'dados')))
+    blocks, hashes = _extend(5, blockchain.last_hash, 2, 1000.0, difficulty=20)
+    blockchain.replace_suffix(1, blocks, hashes)
+    work = blockchain.total_work()
+    assert work == blockchain.chain[0].effective_difficulty + 5 * 20
+    blockchain.close()
+
+    store = FileChainStore(str(tmp_path / 'dados'))
+    blockchain = Blockchain(pow_engine=SerialProofOfWork(), store=store)
+
+    def block(position):
+        raise AssertionError('Bloco {} decodificado para somar o trabalho'.format(position))
+
+    monkeypatch.setattr(store, 'block', block)
+    try:
+        assert blockchain.total_work() == work
+        assert blockchain.work_gain(3, []) == -3 * 20
+    finally:
+        blockchain.close()
+
+
+@pytest.mark.parametrize('lookup, path', [
+    ('block_position', '/blocks/hash/{hash}'),
+    ('block_range', '/blocks/4'),
+])
+def test_block_lookup_and_read_see_the_same_chain(blockchain, monkeypatch, lookup, path):
+    genesis_hash = blockchain.last_hash
+    blocks, hashes = _extend(3, genesis_hash, 2, 1000.0)
+    blockchain.replace_suffix(1, blocks, hashes)
+    shorter = _extend(1, genesis_hash, 2, 2000.0, difficulty=10 ** 6)  # Mais trabalho em menos blocos
+
+    original = getattr(blockchain, lookup)
+
+    def lookup_then_switch(*args):
+        result = original(*args)
+        # Troca de cadeia logo depois da consulta; se a requisição segura o lock, a troca espera por ela
+        switch = threading.Thread(target=blockchain.replace_suffix, args=(1, *shorter))
+        switch.start()
+        switch.join(0.2)
+        return result
+
+    monkeypatch.setattr(blockchain, lookup, lookup_then_switch)
+
+    class Handler(RequestHandler):
+        def log_message(self, *args):
+            pass
+
+    configure(Handler, blockchain, seeds=[])
+    server = ConcurrentHTTPServer(('127.0.0.1', benchmarks._free_port()), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        response = requests.get('http://127.0.0.1:{}{}'.format(server.server_port, path.format(hash=hashes[2])),
+                                timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert response.status_code == 200
+    assert response.json()['index'] == 4
@@ -0,0 +1,32 @@
+import pytest
+
+from blocos import Block, Transaction
+
+
+def _block():
+    return Block.build(2, 1700000000.5, [Transaction('a', 'b', 1)], 35293, 'ab' * 32, 16)
+
+
+def test_from_dict_round_trip():
+    block = _block()
+    copy = Block.from_dict(block.to_dict())
+    assert copy == block
+    assert copy.hash() == block.hash()
+
+
+@pytest.mark.parametrize('field, value', [
+    ('index', 2.0),
+    ('index', True),
+    ('proof', '35293'),
+    ('timestamp', 1700000000),
+    ('timestamp', '1700000000.5'),
+    ('previous_hash', 1),
+    ('merkle_root', ['ab']),
+    ('difficulty', 16.0),
+    ('transactions', {}),
+])
+def test_from_dict_rejects_fields_of_the_wrong_type(field, value):
+    data = _block().to_dict()
+    data[field] = value
+    with pytest.raises(ValueError):
+        Block.from_dict(data)
@@ -0,0 +1,94 @@
+import pytest
+
+import codificacao
+from blocos import Block, Transaction
+from codificacao import DecodeError
+
+
+def _block(index=2, transactions=None, difficulty=16):
+    transactions = transactions if transactions is not None else [
+        Transaction('a', 'b', 1),
+        Transaction('x', 'y', 2.5, fee=1),
+        Transaction(['lista'], {'chave': 1}, None),
+        Transaction('c', 'd', 2 ** 70, fee=0.25),  # Fora de 64 bits: vai como JSON
+        Transaction(True, 'ção', False),
+    ]
+    return Block.build(index, 1700000000.5, transactions, 35293, 'ab' * 32, difficulty)
+
+
+def _encode_version(block, version):
+    """ Bloco no layout de uma versão anterior do formato (o que os nós antigos gravaram) """
+    parts = [codificacao._BLOCK_HEADER.pack(version, block.index, block.timestamp, block.proof)]
+    codificacao._encode_str(parts, block.previous_hash)
+    if version >= 3:
+        codificacao._encode_value(parts, block.merkle_root)
+    if version >= 4:
+        codificacao._encode_value(parts, block.difficulty)
+    parts.append(codificacao._U32.pack(len(block.transactions)))
+    for transaction in block.transactions:
+        values = [transaction.sender, transaction.recipient, transaction.amount]
+        if version >= 2:
+            values.append(transaction.fee)
+        for value in values:
+            codificacao._encode_value(parts, value)
+    return b''.join(parts)
+
+
+def test_round_trip_keeps_values_types_and_hash():
+    block = _block()
+    decoded = codificacao.decode_block(codificacao.encode_block(block))
+    assert decoded == block
+    assert decoded.hash() == block.hash()
+    assert [type(transaction.amount) for transaction in decoded.transactions] == [int, float, type(None), int, bool]
+
+
+def test_round_trip_of_block_without_root_or_difficulty():
+    block = Block(1, 1700000000.0, [], 100, '1')
+    decoded = codificacao.decode_block(codificacao.encode_block(block))
+    assert decoded.merkle_root is None and decoded.difficulty is None
+    assert decoded.hash() == block.hash()
+
+
+@pytest.mark.parametrize('version', [1, 2, 3, 4])
+def test_decodes_every_version(version):
+    block = _block()  # Só com os campos que a versão conhecia
+    if version < 2:
+        for transaction in block.transactions:
+            transaction.fee = 0
+    if version < 3:
+        block.merkle_root = None
+    if version < 4:
+        block.difficulty = None
+    data = _encode_version(block, version)
+    if version == codificacao.VERSION:
+        assert data == codificacao.encode_block(block)
+    decoded = codificacao.decode_block(data)
+    assert decoded == block
+    assert decoded.hash() == block.hash()
+
+
+def test_chain_round_trip_and_streaming_encoder():
+    chain = [_block(index, [Transaction('a', 'b', index)]) for index in range(1, 6)]
+    data = codificacao.encode_chain(chain)
+    assert b''.join(codificacao.iter_encode_chain(iter(chain), len(chain))) == data
+    assert codificacao.decode_chain(data) == chain
+    assert codificacao.decode_chain(codificacao.encode_chain([])) == []
+
+
+def test_block_with_int_timestamp_is_not_encoded():
+    block = Block.build(2, 1700000000, [Transaction('a', 'b', 1)], 1, 'ab' * 32, 16)
+    with pytest.raises(ValueError):
+        codificacao.encode_block(block)
+
+
+def test_malformed_data_raises_decode_error():
+    data = codificacao.encode_block(_block())
+    for bad in (data[:-1], data[:10], data + b'\x00', bytes([99]) + data[1:]):
+        with pytest.raises(DecodeError):
+            codificacao.decode_block(bad)
+
+    chain = codificacao.encode_chain([_block()])
+    with pytest.raises(DecodeError):
+        codificacao.decode_chain(b'XXXX' + chain[4:])
+    with pytest.raises(DecodeError):
+        codificacao.decode_chain(chain[:-3])
@@ -0,0 +1,43 @@
+import copy
+
+from blocos import Block, Transaction
+from enderecos import AddressIndex
+
+
+def _block(index, transactions):
+    return Block.build(index, float(index), transactions, 100 + index, 'h{}'.format(index - 1))
+
+
+def _state(index):
+    return (copy.deepcopy(index.locations), dict(index.received), dict(index.sent), index.length)
+
+
+def test_remove_blocks_restores_previous_state():
+    index = AddressIndex()
+    index.add_block(_block(1, []))
+    index.add_block(_block(2, [Transaction('a', 'b', 5), Transaction('b', 'c', 2, fee=1)]))
+    before = _state(index)
+
+    # Endereços que aparecem pela primeira vez nos blocos removidos (o caso comum em uma troca de cadeia)
+    added = [
+        _block(3, [Transaction('a', 'novo1', 1), Transaction('novo2', 'novo2', 3)]),
+        _block(4, [Transaction('novo1', 'b', 0.5), Transaction('x', 'y', 'texto'), Transaction(['z'], 'w', 1)]),
+    ]
+    for block in added:
+        index.add_block(block)
+    assert index.balance('novo1')['balance'] == 0.5
+
+    index.remove_blocks(added)
+    assert _state(index) == before
+    assert index.balance('a') == {'received': 0, 'sent': 5, 'balance': -5, 'transactions': 1}
+    assert index.balance('novo1') == {'received': 0, 'sent': 0, 'balance': 0, 'transactions': 0}
+    assert index.recent('b') == [(2, 1), (2, 0)]
+
+
+def test_remove_all_blocks_empties_index():
+    index = AddressIndex()
+    blocks = [_block(1, [Transaction('a', 'b', 1)]), _block(2, [Transaction('b', 'a', 1)])]
+    for block in blocks:
+        index.add_block(block)
+    index.remove_blocks(blocks)
+    assert _state(index) == ({}, {}, {}, 0)
@@ -0,0 +1,173 @@
+import importlib.util
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+import requests
+
+import benchmarks
+from ingestao import ConnectionPool, IngestionFull, MetricsIngestor, insert_statement
+
+COLUMNS = ('miner_address', 'hash_rate')
+
+
+class RecordingConnection:
+    """ Conexão sqlite3 (restrita à thread que a abriu) que anota o tamanho de cada executemany """
+
+    def __init__(self, path, batches):
+        self.connection = sqlite3.connect(path)
+        self.batches = batches
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __init__(self):
+                self.cursor = connection.connection.cursor()
+
+            def executemany(self, statement, rows):
+                rows = list(rows)
+                connection.batches.append(len(rows))
+                self.cursor.executemany(statement, rows)
+
+            def close(self):
+                self.cursor.close()
+
+        return Cursor()
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'metricas.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE miner_metrics (miner_address TEXT, hash_rate REAL)')
+    connection.commit()
+    connection.close()
+    return path
+
+
+def _count(path):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT COUNT(*) FROM miner_metrics').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def test_rows_are_written_in_batches(database):
+    batches = []
+    pool = ConnectionPool(lambda: RecordingConnection(database, batches))
+    ingestor = MetricsIngestor(pool, insert_statement('miner_metrics', COLUMNS, sqlite3.paramstyle),
+                               batch_size=100, flush_interval=5)
+    for i in range(250):
+        ingestor.submit(('m{}'.format(i), float(i)))
+    deadline = time.monotonic() + 2
+    while ingestor.written < 200 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches == [100, 100]  # O restante espera o lote encher ou o flush_interval
+
+    ingestor.close()  # Não espera o flush_interval: grava o restante e encerra
+    pool.close()
+    assert batches == [100, 100, 50]
+    assert (ingestor.written, ingestor.failed) == (250, 0)
+    assert _count(database) == 250
+
+
+def test_time_triggered_flush(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database))
+    ingestor = MetricsIngestor(pool, insert_statement('miner_metrics', COLUMNS, 'qmark'), flush_interval=0.1)
+    ingestor.submit(('a', 1.0))
+    deadline = time.monotonic() + 2
+    while ingestor.written < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _count(database) == 1
+    ingestor.close()
+    pool.close()
+
+
+def test_full_queue_raises_and_close_drains(database):
+    release = threading.Event()
+
+    def connect():
+        release.wait()  # Segura a thread de gravação até a fila encher
+        return sqlite3.connect(database)
+
+    pool = ConnectionPool(connect)
+    ingestor = MetricsIngestor(pool, insert_statement('miner_metrics', COLUMNS, 'qmark'), max_queue=3,
+                               batch_size=1, flush_interval=0.05)
+    accepted = 0
+    with pytest.raises(IngestionFull):
+        for i in range(10):
+            ingestor.submit(('m{}'.format(i), 0.0))
+            accepted += 1
+    assert accepted < 10
+
+    release.set()
+    ingestor.close()
+    pool.close()
+    assert ingestor.written == accepted
+    assert _count(database) == accepted
+    with pytest.raises(IngestionFull):
+        ingestor.submit(('depois', 0.0))
+
+
+def test_failed_batch_is_rolled_back(database):
+    pool = ConnectionPool(lambda: sqlite3.connect(database))
+    ingestor = MetricsIngestor(pool, insert_statement('tabela_inexistente', COLUMNS, 'qmark'), flush_interval=0.05)
+    ingestor.submit(('a', 1.0))
+    ingestor.close()
+    pool.close()
+    assert (ingestor.written, ingestor.failed) == (0, 1)
+    assert pool.opened == 0  # A conexão que falhou não volta ao pool
+
+
+def test_metrics_endpoint_queues_and_returns_503_when_full(database, tmp_path, monkeypatch):
+    pytest.importorskip('pymysql')
+    monkeypatch.chdir(tmp_path)
+    spec = importlib.util.spec_from_file_location(
+        'blockchain_v3', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'blockchain _v_3.py'))
+    v3 = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(v3)
+
+    release = threading.Event()
+
+    def connect():
+        release.wait()
+        return sqlite3.connect(database)
+
+    class Handler(v3.RequestHandler):
+        blockchain = v3.Blockchain(connect=lambda: sqlite3.connect(database), paramstyle='qmark')
+
+        def log_message(self, *args):
+            pass
+
+    Handler.blockchain.metrics_ingestor = MetricsIngestor(
+        ConnectionPool(connect), insert_statement('miner_metrics', v3.METRICS_COLUMNS, 'qmark'), max_queue=2,
+        batch_size=1)
+    monkeypatch.setattr(v3.Blockchain, 'rec', 0.2)
+    port = benchmarks._free_port()
+    server = v3.HTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    metrics = dict.fromkeys(v3.METRICS_COLUMNS, 1)
+    try:
+        statuses = [requests.post('http://127.0.0.1:{}/miners/metrics'.format(port), json=metrics, timeout=5)
+                    for _ in range(5)]
+    finally:
+        server.shutdown()
+        server.server_close()
+        release.set()
+        Handler.blockchain.close()
+    assert statuses[0].status_code == 202
+    assert statuses[-1].status_code == 503
+    assert statuses[-1].headers['Retry-After'] == '5'
@@ -0,0 +1,83 @@
+import pytest
+
+from blocos import Transaction
+from mempool import Mempool, MempoolFull
+
+
+def _tx(number, fee=0, sender='a'):
+    return Transaction(sender, 'b', number, fee)
+
+
+def test_take_orders_by_fee_then_arrival():
+    mempool = Mempool()
+    for transaction in [_tx(1), _tx(2, fee=5), _tx(3), _tx(4, fee=5), _tx(5, fee=1)]:
+        assert mempool.add(transaction)
+    assert [transaction.amount for transaction in mempool.take(3)] == [2, 4, 5]
+    assert [transaction.amount for transaction in mempool.take()] == [1, 3]
+    assert len(mempool) == 0 and mempool.size == 0
+
+
+def test_duplicates_and_invalid_fees():
+    mempool = Mempool()
+    transaction = _tx(1)
+    assert mempool.add(transaction)
+    assert not mempool.add(_tx(1))
+    assert transaction.hash() in mempool
+    for fee in (-1, '1', True, float('nan')):
+        with pytest.raises(ValueError):
+            mempool.add(_tx(2, fee=fee))
+    assert len(mempool) == 1
+
+
+def test_full_mempool_evicts_lowest_priority_only_for_better_transactions():
+    mempool = Mempool(max_transactions=3)
+    for transaction in [_tx(1, fee=2), _tx(2, fee=1), _tx(3, fee=1)]:
+        mempool.add(transaction)
+
+    # Mesma taxa da pior: chegou depois, então não desaloja ninguém
+    with pytest.raises(MempoolFull):
+        mempool.add(_tx(4, fee=1))
+
+    # Taxa maior: sai a menos prioritária (menor taxa e, entre iguais, a mais recente)
+    assert mempool.add(_tx(5, fee=3))
+    assert sorted(transaction.amount for transaction in mempool.transactions()) == [1, 2, 5]
+    assert [transaction.amount for transaction in mempool.take()] == [5, 1, 2]
+
+
+def test_byte_limit_keeps_victims_when_new_transaction_does_not_fit():
+    small = _tx(1, fee=1)
+    mempool = Mempool(max_bytes=small.size() * 2 + 5)
+    mempool.add(small)
+    mempool.add(_tx(2, fee=9))
+    big = Transaction('a', 'b' * 200, 3, fee=10)  # Nem desalojando a de taxa 1 ela caberia
+    with pytest.raises(MempoolFull):
+        mempool.add(big)
+    assert len(mempool) == 2
+    assert [transaction.amount for transaction in mempool.take()] == [2, 1]
+
+
+def test_remove_and_sender_index():
+    mempool = Mempool(max_per_sender=2)
+    first, second, other = _tx(1), _tx(2), _tx(3, sender=['lista'])
+    for transaction in (first, second, other):
+        mempool.add(transaction)
+    with pytest.raises(MempoolFull):
+        mempool.add(_tx(4))  # Limite do remetente
+    assert mempool.by_sender('a') == [first, second]
+    assert mempool.by_sender(['lista']) == [other]
+
+    mempool.remove([first.hash(), 'ausente'])
+    assert mempool.by_sender('a') == [second]
+    assert mempool.get(first.hash()) is None
+    assert mempool.add(_tx(4))
+    assert [transaction.amount for transaction in mempool.take()] == [2, 3, 4]
+
+
+def test_heaps_are_rebuilt_after_many_removals():
+    mempool = Mempool()
+    transactions = [_tx(number, fee=number % 7) for number in range(3000)]
+    for transaction in transactions:
+        mempool.add(transaction)
+    mempool.remove(transaction.hash() for transaction in transactions[:2900])
+    assert len(mempool.best_heap) == len(mempool.worst_heap) == 100
+    assert [transaction.amount for transaction in mempool.take(3)] == [2904, 2911, 2918]
@@ -0,0 +1,72 @@
+import hashlib
+
+import pytest
+
+from merkle import EMPTY_ROOT, merkle_proof, merkle_root, verify_proof
+
+
+def _leaves(count):
+    return [hashlib.sha256(str(number).encode()).hexdigest() for number in range(count)]
+
+
+def _node(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def test_small_trees():
+    a, b, c = _leaves(3)
+    assert merkle_root([]) == EMPTY_ROOT
+    assert merkle_root([a]) == a
+    assert merkle_root([a, b]) == _node(a, b)
+    # Em um nível ímpar o último nó sobe sem ser combinado
+    assert merkle_root([a, b, c]) == _node(_node(a, b), c)
+    # Repetir o último não produz a mesma raiz (nada de duplicação)
+    assert merkle_root([a, b, c, c]) != merkle_root([a, b, c])
+
+
+@pytest.mark.parametrize('count', range(1, 18))
+def test_every_leaf_has_a_valid_proof(count):
+    leaves = _leaves(count)
+    root = merkle_root(leaves)
+    for position, leaf in enumerate(leaves):
+        proof = merkle_proof(leaves, position)
+        assert verify_proof(leaf, proof, root)
+        assert len(proof) <= (count - 1).bit_length()
+        other = leaves[(position + 1) % count]
+        if other != leaf:
+            assert not verify_proof(other, proof, root)
+
+
+def test_last_leaf_of_odd_level_skips_that_level():
+    leaves = _leaves(5)
+    # A folha 4 sobe sozinha até o último nível e só então encontra um irmão
+    assert merkle_proof(leaves, 4) == [{'hash': _node(_node(*leaves[:2]), _node(*leaves[2:4])), 'side': 'left'}]
+
+
+def test_tampered_or_malformed_proofs_fail():
+    leaves = _leaves(6)
+    root = merkle_root(leaves)
+    proof = merkle_proof(leaves, 2)
+    flipped = [dict(step) for step in proof]
+    flipped[0]['side'] = 'right' if flipped[0]['side'] == 'left' else 'left'
+    assert not verify_proof(leaves[2], flipped, root)
+    assert not verify_proof(leaves[2], proof[:-1], root)
+    assert not verify_proof(leaves[2], [{'hash': 'zz', 'side': 'left'}], root)
+    assert not verify_proof(leaves[2], [{'side': 'left'}], root)
+    assert not verify_proof(leaves[2], [{'hash': proof[0]['hash'], 'side': 'meio'}], root)
+    assert not verify_proof(None, proof, root)
+    with pytest.raises(IndexError):
+        merkle_proof(leaves, 6)
+
+
+def test_transaction_proof_of_block_with_odd_transaction_count(blockchain):
+    for amount in range(3):
+        blockchain.new_transaction('a', 'b', amount)
+    block = blockchain.new_block(proof=1)
+    for position, transaction in enumerate(block.transactions):
+        response = blockchain.transaction_proof(block.index, transaction.hash())
+        assert response['position'] == position
+        assert response['header'] == block.header()
+        assert verify_proof(transaction.hash(), response['proof'], response['header']['merkle_root'])
+    assert blockchain.transaction_proof(block.index, 'ausente') is None
+    assert blockchain.transaction_proof(block.index + 1, block.transactions[0].hash()) is None
@@ -0,0 +1,57 @@
+import hashlib
+import multiprocessing
+import os
+
+import pytest
+
+import codificacao
+import mineracao
+from mineracao import DEFAULT_DIFFICULTY, MAX_PROOF, ParallelProofOfWork, proof_target, search_range, valid_proof
+
+
+def _proof_from(last_proof, start, difficulty=DEFAULT_DIFFICULTY):
+    """ Primeira prova a partir de start pelo hash apenas, sem o limite de MAX_PROOF """
+    proof = start
+    while hashlib.sha256('{}{}'.format(last_proof, proof).encode()).digest() > proof_target(difficulty):
+        proof += 1
+    return proof
+
+
+def test_proofs_outside_i64_are_never_valid():
+    last_proof = 100
+    assert not valid_proof(last_proof, _proof_from(last_proof, MAX_PROOF))
+    assert search_range(last_proof, MAX_PROOF, MAX_PROOF + 10 ** 6) is None
+    assert search_range(last_proof, -10 ** 6, 0) is None
+    # O intervalo que cruza o limite só considera a parte de dentro, como valid_proof
+    end = MAX_PROOF + 10 ** 6
+    proof = search_range(last_proof, MAX_PROOF - 10 ** 6, end)
+    assert proof == next((nonce for nonce in range(MAX_PROOF - 10 ** 6, end) if valid_proof(last_proof, nonce)), None)
+    assert not valid_proof(last_proof, -1)
+    assert not valid_proof(last_proof, '1')
+
+
+def test_submit_proof_rejects_proof_that_does_not_fit_the_codec(blockchain):
+    blockchain.new_transaction('a', 'b', 1)
+    last = blockchain.last_block
+    difficulty = blockchain.next_difficulty()
+    proof = _proof_from(last.proof, MAX_PROOF, difficulty)
+    with pytest.raises(ValueError):
+        blockchain.submit_proof(proof, blockchain.last_hash, 'minerador')
+    assert len(blockchain.chain) == 1
+
+    proof = search_range(last.proof, MAX_PROOF - 10 ** 6, MAX_PROOF, difficulty)
+    assert proof is not None
+    blockchain.submit_proof(proof, blockchain.last_hash, 'minerador')
+    codificacao.encode_chain(blockchain.get_chain())
+
+
+def _crash(*args):
+    os._exit(1)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='O substituto só chega aos processos com fork')
+def test_parallel_search_raises_when_every_worker_dies(monkeypatch):
+    monkeypatch.setattr(mineracao, '_search_strided', _crash)  # Herdado pelos processos criados com fork
+    engine = ParallelProofOfWork(workers=2)
+    with pytest.raises(RuntimeError):
+        engine.search(100)
@@ -0,0 +1,26 @@
+from pares import Gossip, PeerClient, PeerTable
+
+
+def _gossip():
+    client = PeerClient()
+    return Gossip(client, PeerTable(client, ['http://a', 'http://b']), 'http://eu')
+
+
+def test_failed_fetch_does_not_mark_item_seen():
+    gossip = _gossip()
+    item = {'type': 'block', 'hash': 'h1'}
+    assert gossip.receive('http://a', [item]) == [item]
+    assert gossip.receive('http://b', [item]) == []  # Já em busca no primeiro vizinho
+
+    gossip.fetched('h1', False)
+    assert gossip.receive('http://b', [item]) == [item]  # A busca falhou: outro vizinho pode fornecê-lo
+
+    gossip.fetched('h1', True)
+    assert gossip.receive('http://a', [item]) == []
+    assert gossip.seen['h1'] == 'http://b'
+
+
+def test_known_peers():
+    table = PeerTable(PeerClient(), ['http://a/'])
+    assert table.known('http://a') and table.known('http://a/')
+    assert not table.known('http://desconhecido')
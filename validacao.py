@@ -0,0 +1,77 @@
+"""
+Validação de cadeias recebidas dos vizinhos.
+
+Cada bloco depende apenas de si mesmo e do anterior (elo de hash, prova na
+dificuldade declarada e raiz de Merkle das suas transações), então a
+cadeia pode ser cortada em lotes validados em processos separados. Cada
+lote confere seus elos internos e as provas (incluindo a do primeiro bloco
+contra o último bloco do lote anterior) e devolve os hashes que calculou;
+o processo principal só confere o elo entre um lote e outro. Se a
+dificuldade declarada é a exigida pelo ajuste é conferido à parte, por
+Blockchain.validate_chain, sem nenhum hash.
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from mineracao import valid_proof
+
+
+def validate_blocks(blocks, previous, previous_hash):
+    """
+    Valida blocks como continuação de previous. Se previous_hash for None
+    o elo do primeiro bloco não é conferido (o lote anterior faz isso).
+    Retorna a lista de hashes dos blocos ou None se algum for inválido.
+    """
+    hashes = []
+    for block in blocks:
+        if previous_hash is not None and block.previous_hash != previous_hash:
+            return None
+        if block.index != previous.index + 1:
+            return None
+        if not valid_proof(previous.proof, block.proof, block.effective_difficulty):
+            return None
+        if not block.valid_merkle_root():  # O hash do bloco só cobre as transações através da raiz
+            return None
+        previous, previous_hash = block, block.hash()
+        hashes.append(previous_hash)
+    return hashes
+
+
+class ParallelChainValidator:
+    """ Valida cadeias grandes em lotes distribuídos por um pool de processos """
+
+    def __init__(self, workers=None, batch_size=5000, min_parallel=20000):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_parallel = min_parallel  # Abaixo disso o custo de enviar os lotes não compensa
+        self.pool = None
+
+    def validate(self, blocks, previous, previous_hash):
+        """ Mesmo contrato de validate_blocks, com previous_hash obrigatório """
+        if self.workers == 1 or len(blocks) < self.min_parallel:
+            return validate_blocks(blocks, previous, previous_hash)
+
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers)
+        batches = []
+        for start in range(0, len(blocks), self.batch_size):
+            batch = blocks[start:start + self.batch_size]
+            predecessor = previous if start == 0 else blocks[start - 1]
+            batches.append(self.pool.submit(validate_blocks, batch, predecessor, None))
+
+        # Interrompe no primeiro lote inválido, cancelando os que ainda não começaram
+        pending = set(batches)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            if any(future.exception() is not None or future.result() is None for future in done):
+                for future in pending:
+                    future.cancel()
+                return None
+
+        hashes = []
+        for future, start in zip(batches, range(0, len(blocks), self.batch_size)):
+            expected = previous_hash if start == 0 else hashes[-1]
+            if blocks[start].previous_hash != expected:
+                return None
+            hashes.extend(future.result())
+        return hashes